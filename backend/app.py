@@ -1,11 +1,37 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from backend.services.agent import Agent
+from backend.services.memory import make_conversation_store
 from fastapi.middleware.cors import CORSMiddleware
 
 
 
-app = FastAPI(title="IA Bot Backend", version="0.1.0")
+# Construit au démarrage de chaque worker (lifespan), pas à l'import: la KB est
+# mappée depuis l'index partagé et les caches sont préchauffés avant la 1re requête.
+agent: Agent | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global agent
+    # LYON_KB_SEMANTIC=1 active la recherche sémantique (embeddings Ollama)
+    agent = Agent(
+        semantic=os.getenv("LYON_KB_SEMANTIC") == "1",
+        llm_cache_path=os.getenv("LYON_LLM_CACHE_PATH") or None,
+        memory=make_conversation_store(os.getenv("LYON_MEMORY_DB")),
+    )
+    await agent.startup()
+    yield
+    await agent.aclose()
+
+
+app = FastAPI(title="IA Bot Backend", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +44,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent = Agent()
-
 class ChatRequest(BaseModel):
     conversation_id: str = Field(default="default")
     message: str
@@ -37,3 +61,33 @@ def health():
 async def chat(req: ChatRequest):
     result = await agent.run(conversation_id=req.conversation_id, user_message=req.message)
     return result
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Variante streaming de /chat (NDJSON, une ligne JSON par événement):
+    - {"event": "kb_search", "count": n}
+    - {"event": "tool_call", "status": "started" | "finished", "tool": ...}
+    - {"event": "token", "text": "..."}  (réponse finale générée par le LLM)
+    - {"event": "done", "answer": ..., "sources": [...], "trace": {...}}  (toujours en dernier)
+    """
+    queue: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def produce():
+        try:
+            result = await agent.run(conversation_id=req.conversation_id, user_message=req.message, emit=queue.put)
+            await queue.put({"event": "done", **result})
+        except Exception as e:
+            await queue.put({"event": "error", "error": str(e)})
+        finally:
+            await queue.put(None)
+
+    async def lines():
+        task = asyncio.create_task(produce())
+        try:
+            while (event := await queue.get()) is not None:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            task.cancel()  # client déconnecté: on arrête la génération
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,29 @@
+import time
+from pathlib import Path
+
+from backend.services.kb import KB_INDEX_PATH, KnowledgeBase
+
+# Compile backend/data/kb.json en KB binaire (lieux en colonnes + index) mappée par le backend.
+# Lancer depuis la racine: python -m backend.scripts.build_kb
+KB_PATH = Path("backend/data/kb.json")
+KB_INDEX = Path(KB_INDEX_PATH)
+
+
+def main():
+    if not KB_PATH.exists():
+        raise FileNotFoundError(f"KB introuvable : {KB_PATH}")
+
+    # force la reconstruction (sinon l'artefact à jour est simplement réutilisé)
+    KB_INDEX.unlink(missing_ok=True)
+
+    t0 = time.time()
+    kb = KnowledgeBase(str(KB_PATH), index_path=str(KB_INDEX))
+    if not KB_INDEX.exists():
+        raise RuntimeError("Compilation impossible (numpy est requis)")
+
+    size_kb = KB_INDEX.stat().st_size / 1024
+    print(f"✅ {len(kb.places)} lieux compilés -> {KB_INDEX} ({size_kb:.0f} Ko, {time.time() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,13 @@ HEADERS = {
 TIMEOUT = 15
 SLEEP_S = 0.4  # évite de spammer le site
 
+# lxml si installé (parse plusieurs fois plus rapide), sinon le parser standard
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 
 def _abs_url(base: str, maybe_rel: str | None) -> str | None:
     if not maybe_rel:
@@ -40,7 +47,7 @@ def extract_main_image(page_url: str) -> str | None:
     except Exception:
         return None
 
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(r.text, HTML_PARSER)
 
     og = soup.find("meta", attrs={"property": "og:image"})
     if og and og.get("content"):
@@ -1,12 +1,20 @@
+import asyncio
 import time
 import re
 from datetime import date, datetime, timedelta
-from typing import Any
-
-from backend.services.kb import KnowledgeBase
-from backend.services.ollama import OllamaClient
+from typing import Any, Awaitable, Callable
+
+from backend.services.cache import LRUCache
+from backend.services.embeddings import VectorIndex
+from backend.services.kb import KB_INDEX_PATH, KnowledgeBase
+from backend.services.keywords import keyword_categories
+from backend.services.llm_cache import LLMCache
+from backend.services.memory import ConversationStore, make_conversation_store
+from backend.services.ollama import ChatMessage, OllamaClient
 from backend.services.mcp_client import MCPClient
-from backend.services.toolcall import parse_tool_call_loose
+from backend.services.packing import TOOL_RESULT_TOKEN_BUDGET, estimate_tokens, pack_tool_result
+from backend.services.router import PREFETCH_MIN_CONFIDENCE, ROUTER_MIN_CONFIDENCE, prefetch_covers, route_intent
+from backend.services.toolcall import ToolCall, parse_tool_calls_loose
 
 
 SYSTEM_PROMPT = """
@@ -47,6 +55,11 @@ Appels d’outils (format strict)
   "tool": "nom_du_tool",
   "args": { ... }
 }
+- Si la demande combine plusieurs besoins indépendants (ex: des lieux ET des événements), tu réponds UNIQUEMENT avec une liste JSON de tool-calls :
+[
+  {"tool": "nom_du_tool", "args": { ... }},
+  {"tool": "nom_du_tool", "args": { ... }}
+]
 
 Réponse finale
 - Réponds en français.
@@ -58,61 +71,6 @@ Réponse finale
 
 # Détection contexte
 
-TOURISM_KEYWORDS = {
-    # intention générale
-    "visiter", "visite", "voir", "découvrir", "decouvrir", "faire", "sortir", "idées", "idees",
-    "programme", "itinéraire", "itineraire", "plan", "conseil", "recommandation", "reco",
-    "top", "meilleur", "incontournable", "must", "que faire", "quoi faire",
-
-    # temps / planning
-    "aujourd'hui", "aujourdhui", "demain", "ce soir", "ce midi", "cet après-midi", "cet apres midi",
-    "ce week-end", "ce weekend", "week-end", "weekend", "cette semaine", "la semaine",
-    "samedi", "dimanche", "matin", "après-midi", "apres-midi", "soir", "nuit",
-    "2 jours", "deux jours", "3 jours", "trois jours",
-
-    # culture / sorties
-    "musée", "musee", "musées", "musees", "expo", "exposition", "expositions", "galerie",
-    "théâtre", "theatre", "spectacle", "cinéma", "cinema", "opéra", "opera",
-    "concert", "festival", "événement", "evenement", "événements", "evenements", "agenda",
-
-    # manger / boire
-    "restaurant", "resto", "bouchon", "brasserie", "bar", "pub", "café", "cafe", "terrasse",
-    "manger", "bouffer", "déjeuner", "dejeuner", "dîner", "diner", "goûter", "gouter",
-    "petit-déj", "petit dej", "petit déjeuner", "petit dejeuner",
-    "menu", "carte", "réserver", "reserver", "apéro", "apero", "cocktail", "bière", "biere",
-    "végétarien", "vegetarien", "vegan", "halal", "sans gluten",
-
-    # balades / nature
-    "balade", "promenade", "rando", "randonnée", "randonnee", "marche", "courir",
-    "parc", "jardin", "forêt", "foret", "nature", "point de vue", "coucher de soleil",
-    "quais", "berges", "rive", "pont",
-
-    # shopping / loisirs
-    "shopping", "boutique", "marché", "marche", "brocante", "vide-grenier", "vide grenier",
-    "loisir", "activité", "activite", "escape game", "bowling", "patinoire",
-
-    # patrimoine
-    "patrimoine", "monument", "basilique", "cathédrale", "cathedrale", "église", "eglise",
-    "place", "rue", "quartier", "traboule", "fourvière", "fourviere", "vieux-lyon", "vieux lyon",
-    "histoire", "architecture",
-
-    # infos variables
-    "adresse", "horaires", "horaire", "ouverture", "ouvert", "fermé", "ferme",
-    "tarif", "tarifs", "prix", "billet", "tickets", "réservation", "reservation",
-}
-
-# Lyon / quartiers
-LYON_KEYWORDS = {
-    "lyon", "grand lyon", "métropole", "metropole",
-    "presqu'île", "presquile", "vieux-lyon", "vieux lyon", "croix-rousse", "croix rousse",
-    "confluence", "part-dieu", "part dieu", "bellecour", "terreaux", "hotel de ville",
-    "fourvière", "fourviere", "saône", "saone", "rhône", "rhone", "tête d'or", "tete d'or",
-    "guillotière", "guillotiere", "brotteaux", "monplaisir", "gerland", "vaise", "perrache",
-    "saint-jean", "saint paul", "saint-georges", "saint georges",
-    "caluire", "villeurbanne", "oullins", "bron", "venissieux",
-    "vaulx-en-velin", "vaulx", "decines", "meyzieu",
-}
-
 ARR_RE = re.compile(r"\b(1er|2e|3e|4e|5e|6e|7e|8e|9e)\b|\b([1-9])\s*(?:eme|ème)\b", re.IGNORECASE)
 
 _CITY_HINT = re.compile(
@@ -128,13 +86,7 @@ _SMALL_TALK = re.compile(
 
 
 def _norm(s: str) -> str:
-    s = s.lower().strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-
-def _contains_any(needle_set: set[str], text: str) -> bool:
-    return any(k in text for k in needle_set)
+    return " ".join(s.lower().split())
 
 
 def _extract_city_hint(msg: str) -> str | None:
@@ -158,20 +110,13 @@ def _looks_like_tool_json(text: str) -> bool:
     if not text:
         return False
     t = text.strip()
-    if not (t.startswith("{") and t.endswith("}")):
+    if not ((t.startswith("{") and t.endswith("}")) or (t.startswith("[") and t.endswith("]"))):
         return False
     return '"tool"' in t and '"args"' in t
 
 
 def _needs_live_data(msg: str) -> bool:
-    m = msg.lower()
-    return any(k in m for k in [
-        "horaire", "horaires", "ouvert", "ouverture",
-        "adresse", "où se trouve", "comment y aller", "accès", "acces",
-        "tarif", "tarifs", "prix", "billet", "tickets",
-        "événement", "evenement", "événements", "evenements", "agenda",
-        "aujourd", "ce week", "ce weekend", "ce week-end", "demain"
-    ])
+    return "live" in keyword_categories(_norm(msg))
 
 
 def _is_small_talk(msg: str) -> bool:
@@ -193,13 +138,14 @@ def _small_talk_answer(msg: str) -> str:
 
 
 def _is_lyon_context(text: str) -> bool:
-    return ("lyon" in text) or bool(ARR_RE.search(text)) or _contains_any(LYON_KEYWORDS, text)
+    return "lyon" in keyword_categories(text) or bool(ARR_RE.search(text))
 
 
 def _is_tourism_request(text: str) -> bool:
-    if _contains_any(TOURISM_KEYWORDS, text):
+    cats = keyword_categories(text)
+    if "tourism" in cats:
         return True
-    if _is_lyon_context(text) and any(w in text for w in ["dans", "à", "au", "aux", "vers", "près", "proche"]):
+    if "near" in cats and _is_lyon_context(text):
         return True
     return False
 
@@ -263,29 +209,339 @@ def _format_event_line(it: dict[str, Any]) -> str:
 
 # Agent
 
+ANSWER_CACHE_SIZE = 2048
+KB_RELOAD_CHECK_S = 2.0
+LLM_CACHE_SIZE = 1024
+LLM_CACHE_TTL_S = 3600.0
+# Historique envoyé au LLM: le dernier tour est gardé tel qu'il a été envoyé (blocs
+# KB/tool compris), pour qu'Ollama réutilise son préfixe au tour suivant; les tours
+# précédents sont compactés (message brut + réponse). Plafonds sur ces tours compactés,
+# à côté du dernier tour qui peut porter un résultat de tool (~TOOL_RESULT_TOKEN_BUDGET):
+# au-delà, les plus anciens sont retirés d'un bloc (jusqu'à la moitié des plafonds).
+HISTORY_MAX_MESSAGES = 8
+HISTORY_MAX_TOKENS = TOOL_RESULT_TOKEN_BUDGET
+# délai commun à tous les tools d'un même message (exécutés en parallèle)
+TOOLS_DEADLINE_S = 30.0
+
+# Callback d'événements intermédiaires (mode streaming): kb_search, tool_call, token
+EmitFn = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+async def _notify(emit: EmitFn | None, event: dict[str, Any]) -> None:
+    if emit is not None:
+        await emit(event)
+
+
+def _tool_args(tool: str, args: dict[str, Any]) -> dict[str, Any]:
+    """Arguments MCP normalisés (alias + valeurs par défaut), comparables entre routeur et LLM."""
+    args = dict(args)
+    if tool == "scrape_category":
+        if "query" not in args and "categorie" in args:
+            args["query"] = args.pop("categorie")
+        args.setdefault("limit", 8)
+    if tool == "scrape_events":
+        args.setdefault("limit", 20)
+    return args
+
+
+def _discard(task: "asyncio.Task[Any] | None") -> None:
+    """Abandonne un prefetch inutilisé (et consomme son éventuelle exception)."""
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+def _history_over(history: list[dict[str, str]], max_messages: int, max_tokens: int) -> bool:
+    return len(history) > max_messages or sum(estimate_tokens(m["content"]) for m in history) > max_tokens
+
+
+def _split_turns(history: list[dict[str, str]]) -> list[list[dict[str, str]]]:
+    """
+    Découpe l'historique en tours. Le premier message d'un tour porte le message brut
+    ("message"); les historiques plus anciens, sans cette clé, sont découpés aux messages user.
+    """
+    marked = any("message" in m for m in history)
+    turns: list[list[dict[str, str]]] = []
+    for m in history:
+        starts = "message" in m if marked else m["role"] == "user"
+        if starts or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def _compact_turn(turn: list[dict[str, str]]) -> list[dict[str, str]]:
+    """Tour réduit au message brut de l'utilisateur et à la réponse finale (sans blocs KB/tool)."""
+    first = turn[0]
+    if "message" not in first or len(turn) < 2:
+        return turn
+    return [{"role": "user", "content": first["message"]}, {"role": "assistant", "content": turn[-1]["content"]}]
+
+
+def _trim_history(history: list[dict[str, str]], turn: list[dict[str, str]]) -> list[dict[str, str]]:
+    """
+    Historique à sauvegarder après `turn`: les tours précédents compactés puis `turn` complet.
+    Coupe par tours entiers, seulement au-delà des plafonds; `turn` n'est jamais retiré.
+    """
+    older = [m for t in _split_turns(history) for m in _compact_turn(t)]
+    if _history_over(older, HISTORY_MAX_MESSAGES, HISTORY_MAX_TOKENS):
+        turns = _split_turns(older)
+        while turns and _history_over([m for t in turns for m in t], HISTORY_MAX_MESSAGES // 2, HISTORY_MAX_TOKENS // 2):
+            turns.pop(0)
+        older = [m for t in turns for m in t]
+    return older + turn
+
+
+def _starts_tool_json(text: str) -> bool:
+    return text.lstrip()[:1] in ("{", "[")
+
+
+def _messages_key(messages: list[ChatMessage]) -> str:
+    """Texte des messages hors system prompt (clé du cache LLM, le system est haché à part)."""
+    return "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages if m["role"] != "system")
+
+
 class Agent:
-    def __init__(self):
-        self.kb = KnowledgeBase()
+    def __init__(
+        self,
+        semantic: bool = False,
+        llm_cache_path: str | None = None,
+        memory: ConversationStore | None = None,
+    ):
+        self.kb = KnowledgeBase(index_path=KB_INDEX_PATH)
         self.ollama = OllamaClient(base_url="http://localhost:11434", model="llama3.1:8b")
         self.mcp = MCPClient(base_url="http://localhost:8001")
-        self.memory: dict[str, list[dict[str, str]]] = {}
+        self.memory = memory if memory is not None else make_conversation_store()
+        self.semantic = semantic
+        self.semantic_error: str | None = None
+        # Réponses "kb_direct_answer": fonction déterministe de (KB, message normalisé)
+        self.answer_cache = LRUCache(max_entries=ANSWER_CACHE_SIZE)
+        # Générations Ollama (pass 1 / pass 2): exact + questions quasi identiques
+        self.llm_cache = LLMCache(max_entries=LLM_CACHE_SIZE, ttl_s=LLM_CACHE_TTL_S, path=llm_cache_path)
+        self._kb_checked_at = time.time()
+        self._kb_reload: asyncio.Task[None] | None = None
+
+    async def startup(self) -> None:
+        """
+        Préchauffe la KB (filtres, pages de l'index mappé) puis prépare la recherche
+        sémantique (si activée): synchronise l'index vectoriel sur disque avec la KB
+        (seuls les lieux modifiés sont ré-embeddés).
+        En cas d'échec (Ollama absent, numpy manquant), on reste en lexical seul.
+        """
+        self.kb.warmup()
+        await self._attach_vectors(self.kb)
+
+    async def _attach_vectors(self, kb: KnowledgeBase) -> None:
+        if not self.semantic:
+            return
+        try:
+            index = VectorIndex()
+            await index.sync(kb.places, self.ollama.embed, self.ollama.embed_model)
+            if not kb.attach_vectors(index):
+                self.semantic_error = "index vectoriel non aligné sur la KB"
+        except Exception as e:
+            self.semantic_error = str(e)
+
+    async def _refresh_kb(self) -> None:
+        """
+        Lance le rechargement de la KB si kb.json a changé (vérifié au plus toutes
+        les KB_RELOAD_CHECK_S). Les requêtes continuent sur l'ancienne KB pendant
+        la reconstruction, qui tourne en tâche de fond.
+        """
+        now = time.time()
+        if now - self._kb_checked_at < KB_RELOAD_CHECK_S:
+            return
+        self._kb_checked_at = now
+        if self._kb_reload is not None and not self._kb_reload.done():
+            return
+        if not self.kb.is_stale():
+            return
+        self._kb_reload = asyncio.create_task(self._reload_kb())
+
+    async def _reload_kb(self) -> None:
+        """
+        Reconstruit la KB (artefact sous verrou, index, préchauffage) dans un thread
+        pour ne pas bloquer la boucle, puis la substitue à l'ancienne.
+        Le hash de contenu fait partie des clés du cache de réponses: les anciennes
+        entrées ne sont plus jamais servies et sont purgées.
+        """
+        def build() -> KnowledgeBase:
+            kb = KnowledgeBase(str(self.kb.path), index_path=self.kb.index_path)
+            kb.warmup()
+            return kb
 
-    def _build_prompt(self, history: list[dict[str, str]], user_block: str) -> str:
-        hist = history[-6:]
-        hist_text = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in hist])
-        return f"{hist_text}\nUSER: {user_block}\nASSISTANT:"
+        try:
+            kb = await asyncio.to_thread(build)
+        except (OSError, ValueError):
+            return
+        await self._attach_vectors(kb)
+        self.kb = kb
+        self.answer_cache.clear()
+
+    async def aclose(self) -> None:
+        """Ferme les clients HTTP partagés et persiste le cache LLM (shutdown de l'app)."""
+        _discard(self._kb_reload)
+        self.llm_cache.save()
+        await self.ollama.aclose()
+        await self.mcp.aclose()
+        self.memory.close()
+
+    async def _embed_query(self, text: str) -> list[float] | None:
+        if self.kb.vectors is None:
+            return None
+        try:
+            vecs = await self.ollama.embed([text])
+        except Exception:
+            return None
+        return vecs[0] if vecs else None
+
+    async def _generate(
+        self,
+        messages: list[ChatMessage],
+        emit: EmitFn | None = None,
+        message: str | None = None,
+        query_vec: list[float] | None = None,
+        stats: dict[str, float] | None = None,
+        hold_tool_json: bool = False,
+    ) -> tuple[str, bool]:
+        """
+        chat() classique, ou streaming token par token si un `emit` est fourni.
+        Avec `hold_tool_json` (pass 1), les tokens sont retenus jusqu'au premier caractère
+        non blanc, et jamais émis si la sortie commence comme un tool-call JSON ({ ou [).
+        Passe d'abord par le cache LLM (exact, puis similarité sur `query_vec` si fourni).
+        Retourne (texte, servi_depuis_le_cache).
+        """
+        model = self.ollama.model
+        prompt = _messages_key(messages)
+        cached = self.llm_cache.get(model, SYSTEM_PROMPT, prompt)
+        if cached is None and message and query_vec:
+            cached = self.llm_cache.get_similar(model, SYSTEM_PROMPT, prompt, message, query_vec)
+        if cached is not None:
+            if not (hold_tool_json and _starts_tool_json(cached)):
+                await _notify(emit, {"event": "token", "text": cached})
+            return cached, True
+
+        if emit is None:
+            out = await self.ollama.chat(messages, stats=stats)
+        else:
+            chunks: list[str] = []
+            held: bool | None = None if hold_tool_json else False  # None: début pas encore vu
+            async for chunk in self.ollama.chat_stream(messages, stats=stats):
+                chunks.append(chunk)
+                if held is None:
+                    head = "".join(chunks)
+                    if not head.strip():
+                        continue
+                    held = _starts_tool_json(head)
+                    if not held:
+                        await emit({"event": "token", "text": head})
+                elif not held:
+                    await emit({"event": "token", "text": chunk})
+            out = "".join(chunks).strip()
+
+        if out and out.strip():
+            self.llm_cache.set(model, SYSTEM_PROMPT, prompt, out, message=message, vec=query_vec)
+        return out, False
+
+    async def _call_tools(
+        self,
+        calls: list[tuple[str, dict[str, Any]]],
+        steps: list[str],
+        emit: EmitFn | None = None,
+        prefetch: "asyncio.Task[dict[str, Any]] | None" = None,
+        prefetch_key: tuple[str, dict[str, Any]] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Exécute les tool-calls en parallèle avec un délai commun (TOOLS_DEADLINE_S).
+        Un prefetch compatible avec un des appels (voir prefetch_covers) est réutilisé,
+        ses items tronqués à la limite demandée; sinon il est annulé.
+        Payloads dans l'ordre des appels; erreur ou délai dépassé -> {"error": ...}.
+        """
+        tasks: list[asyncio.Task[dict[str, Any]]] = []
+        reused: asyncio.Task[dict[str, Any]] | None = None
+        for tool, args in calls:
+            if prefetch is not None and prefetch_key is not None and prefetch_covers(prefetch_key, tool, args):
+                steps.append("tool_prefetch_hit")
+                tasks.append(prefetch)
+                reused, prefetch = prefetch, None
+            else:
+                tasks.append(asyncio.create_task(self.mcp.call_tool(tool, args)))
+            await _notify(emit, {"event": "tool_call", "status": "started", "tool": tool, "args": args})
+        if prefetch is not None:
+            steps.append("tool_prefetch_cancelled")
+            _discard(prefetch)
 
-    async def run(self, conversation_id: str, user_message: str) -> dict[str, Any]:
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=TOOLS_DEADLINE_S)
+        except asyncio.CancelledError:
+            for t in tasks:
+                t.cancel()
+            raise
+        for t in pending:
+            t.cancel()
+
+        payloads: list[dict[str, Any]] = []
+        for (tool, args), task in zip(calls, tasks):
+            if task in pending:
+                payload = {"error": f"timeout ({TOOLS_DEADLINE_S:.0f}s)"}
+                steps.append("tool_timeout")
+            elif task.exception() is not None:
+                payload = {"error": str(task.exception())}
+                steps.append("tool_error")
+            else:
+                payload = task.result()
+                if task is reused and isinstance(payload, dict) and isinstance(payload.get("items"), list):
+                    payload = {**payload, "items": payload["items"][:args.get("limit")]}
+            await _notify(emit, {
+                "event": "tool_call",
+                "status": "finished",
+                "tool": tool,
+                "ok": not (isinstance(payload, dict) and payload.get("error")),
+            })
+            payloads.append(payload)
+        return payloads
+
+    async def _remember(
+        self,
+        conversation_id: str,
+        history: list[dict[str, str]],
+        user_message: str,
+        answer: str,
+        sent: list[ChatMessage] | None = None,
+    ) -> None:
+        """Ajoute le tour: les messages tels qu'envoyés au LLM (s'il a été appelé), puis la réponse."""
+        turn = [dict(m) for m in sent[1 + len(history):]] if sent is not None else [{"role": "user", "content": user_message}]
+        turn[0]["message"] = user_message
+        turn.append({"role": "assistant", "content": answer})
+        await self.memory.asave(conversation_id, _trim_history(history, turn))
+
+    def _build_messages(self, history: list[dict[str, str]], user_block: str) -> list[ChatMessage]:
+        """
+        Messages /api/chat: le system prompt (statique) toujours en tête puis l'historique
+        (voir _trim_history): le dernier tour tel qu'il a été envoyé, pour qu'Ollama
+        réutilise le préfixe déjà évalué d'un appel et d'un tour à l'autre.
+        """
+        hist = [{"role": m["role"], "content": m["content"]} for m in history]
+        return [{"role": "system", "content": SYSTEM_PROMPT}, *hist, {"role": "user", "content": user_block}]
+
+    async def run(self, conversation_id: str, user_message: str, emit: EmitFn | None = None) -> dict[str, Any]:
+        """
+        Traite un message et renvoie {answer, sources, trace}.
+        Si `emit` est fourni, les étapes intermédiaires et les tokens de la réponse
+        finale (pass 2, ou pass 1 si elle répond sans tool) lui sont envoyés au fil de l'eau.
+        """
         t0 = time.time()
         steps: list[str] = []
         sources: list[dict] = []
-        history = self.memory.get(conversation_id, [])
+        history = await self.memory.aget(conversation_id)
 
         # 0) Small talk
         if _is_small_talk(user_message):
             answer = _small_talk_answer(user_message)
-            history = history + [{"role": "user", "content": user_message}, {"role": "assistant", "content": answer}]
-            self.memory[conversation_id] = history[-12:]
+            await self._remember(conversation_id, history, user_message, answer)
             return {
                 "answer": answer,
                 "sources": [],
@@ -328,8 +584,7 @@ class Agent:
                 "(musées, restos, balades, patrimoine, événements). "
                 "Tu cherches quoi ?"
             )
-            history = history + [{"role": "user", "content": user_message}, {"role": "assistant", "content": answer}]
-            self.memory[conversation_id] = history[-12:]
+            await self._remember(conversation_id, history, user_message, answer)
             return {
                 "answer": answer,
                 "sources": [],
@@ -344,11 +599,39 @@ class Agent:
             }
 
         # 3) KB search
+        await self._refresh_kb()
+        need_live = _needs_live_data(user_message)
+
+        # 3a) Cache des réponses KB directes
+        answer_key = (self.kb.content_hash, self.kb.vectors is not None, txt)
+        if not need_live:
+            cached = self.answer_cache.get(answer_key)
+            if cached is not None:
+                answer = cached["answer"]
+                await _notify(emit, {"event": "kb_search", "count": cached["count"]})
+                await self._remember(conversation_id, history, user_message, answer)
+                return {
+                    "answer": answer,
+                    "sources": [dict(s) for s in cached["sources"]],
+                    "trace": {
+                        "kb_used": True,
+                        "tool_called": None,
+                        "model": self.ollama.model,
+                        "latency_ms": int((time.time() - t0) * 1000),
+                        "steps": ["kb_search", "kb_direct_answer", "answer_cache_hit"],
+                        "errors": {},
+                        "answer_cache": {"hit": True, **self.answer_cache.stats()},
+                    },
+                }
+
         steps.append("kb_search")
-        kb_hits = self.kb.search(user_message)
+        query_vec = await self._embed_query(user_message)
+        if query_vec is not None:
+            steps.append("kb_semantic")
+        kb_hits = self.kb.search(user_message, query_vec=query_vec)
         kb_items = kb_hits.get("items", []) or []
         have_kb_answer = len(kb_items) > 0
-        need_live = _needs_live_data(user_message)
+        await _notify(emit, {"event": "kb_search", "count": len(kb_items)})
 
         # 3bis) Priorité KB si pas besoin d'info variable
         if have_kb_answer and not need_live:
@@ -364,9 +647,13 @@ class Agent:
                     lines.append(f"* {name}")
 
             answer = _strip_decision_prefix("\n".join(lines))
+            self.answer_cache.set(answer_key, {
+                "answer": answer,
+                "sources": [dict(s) for s in sources],
+                "count": len(kb_items),
+            })
 
-            history = history + [{"role": "user", "content": user_message}, {"role": "assistant", "content": answer}]
-            self.memory[conversation_id] = history[-12:]
+            await self._remember(conversation_id, history, user_message, answer)
 
             return {
                 "answer": answer,
@@ -378,6 +665,7 @@ class Agent:
                     "latency_ms": int((time.time() - t0) * 1000),
                     "steps": steps,
                     "errors": {},
+                    "answer_cache": {"hit": False, **self.answer_cache.stats()},
                 },
             }
 
@@ -392,86 +680,106 @@ class Agent:
         kb_summary = "\n".join(kb_summary_parts) if kb_summary_parts else "KB: aucun résultat."
         force_no_tool = have_kb_answer and (not need_live)
 
-        # 5) PASS 1 LLM: tool-call ou réponse
-        steps.append("llm_pass1")
-        user_block_pass1 = f"""Message utilisateur: {user_message}
+        # 5) Routage direct: si le tool est évident, pas de LLM pass 1
+        route = route_intent(txt, kb_items)
+        steps.append(route.step())
+        tool_calls: list[ToolCall] = []
+        out1 = ""
+        messages1: list[ChatMessage] | None = None
+        sent: list[ChatMessage] | None = None  # derniers messages envoyés au LLM pour ce tour
+        llm_stats: dict[str, float] = {}
+
+        # prefetch spéculatif: tool probable lancé pendant la pass 1, gardé si le LLM le choisit
+        prefetch: asyncio.Task[dict[str, Any]] | None = None
+        prefetch_key: tuple[str, dict[str, Any]] | None = None
+
+        if route.tool and route.confidence >= ROUTER_MIN_CONFIDENCE and not force_no_tool:
+            steps.append("router_fast_path")
+            tool_calls = [{"tool": route.tool, "args": dict(route.args)}]
+        else:
+            if route.tool and route.confidence >= PREFETCH_MIN_CONFIDENCE and not force_no_tool:
+                prefetch_key = (route.tool, _tool_args(route.tool, route.args))
+                prefetch = asyncio.create_task(self.mcp.call_tool(*prefetch_key))
+                steps.append(f"tool_prefetch:{route.tool}")
+
+            # 5bis) PASS 1 LLM: tool-call ou réponse
+            steps.append("llm_pass1")
+            user_block_pass1 = f"""Message utilisateur: {user_message}
 
 {kb_summary}
 
 IMPORTANT:
 - {"Tu DOIS répondre sans tool." if force_no_tool else "Tu peux appeler un tool uniquement si nécessaire."}
-- Si tu appelles un tool, réponds UNIQUEMENT avec le JSON tool-call.
+- Si tu appelles un ou plusieurs tools, réponds UNIQUEMENT avec le JSON tool-call (objet ou liste).
 - Sinon, réponds directement (format naturel).
 - Si tu réponds avec la KB: cite UNIQUEMENT des lieux présents dans KB_ITEMS.
 - Ne crée jamais de lien : uniquement ceux fournis.
 """
-        prompt1 = self._build_prompt(history, user_block_pass1)
+            messages1 = self._build_messages(history, user_block_pass1)
+            sent = messages1
 
-        try:
-            out1 = await self.ollama.generate(prompt=prompt1, system=SYSTEM_PROMPT)
-        except Exception as e:
-            return {
-                "answer": "Désolé, le modèle IA est indisponible (Ollama).",
-                "sources": [],
-                "trace": {
-                    "kb_used": have_kb_answer,
-                    "tool_called": None,
-                    "model": self.ollama.model,
-                    "latency_ms": int((time.time() - t0) * 1000),
-                    "steps": steps + ["ollama_error_pass1"],
-                    "errors": {"ollama_error": str(e)},
-                },
-            }
-
-        if not out1 or not out1.strip():
-            return {
-                "answer": "Désolé, je n'ai pas réussi à générer une réponse.",
-                "sources": [],
-                "trace": {
-                    "kb_used": have_kb_answer,
-                    "tool_called": None,
-                    "model": self.ollama.model,
-                    "latency_ms": int((time.time() - t0) * 1000),
-                    "steps": steps + ["empty_llm_pass1"],
-                    "errors": {},
-                },
-            }
-
-        out1 = _strip_decision_prefix(out1)
-        tool_call = parse_tool_call_loose(out1)
+            try:
+                out1, hit1 = await self._generate(
+                    messages1, emit, message=user_message, query_vec=query_vec, stats=llm_stats, hold_tool_json=True
+                )
+            except Exception as e:
+                _discard(prefetch)
+                return {
+                    "answer": "Désolé, le modèle IA est indisponible (Ollama).",
+                    "sources": [],
+                    "trace": {
+                        "kb_used": have_kb_answer,
+                        "tool_called": None,
+                        "model": self.ollama.model,
+                        "latency_ms": int((time.time() - t0) * 1000),
+                        "steps": steps + ["ollama_error_pass1"],
+                        "errors": {"ollama_error": str(e)},
+                    },
+                }
 
-        if force_no_tool:
-            tool_call = None
+            if not out1 or not out1.strip():
+                _discard(prefetch)
+                return {
+                    "answer": "Désolé, je n'ai pas réussi à générer une réponse.",
+                    "sources": [],
+                    "trace": {
+                        "kb_used": have_kb_answer,
+                        "tool_called": None,
+                        "model": self.ollama.model,
+                        "latency_ms": int((time.time() - t0) * 1000),
+                        "steps": steps + ["empty_llm_pass1"],
+                        "errors": {},
+                    },
+                }
 
-        if tool_call is None and _looks_like_tool_json(out1):
-            out1 = "Je peux t’aider, mais j’ai besoin que tu précises un peu (type de lieu, quartier, ou ce que tu veux exactement)."
+            if hit1:
+                steps.append("llm_pass1_cache_hit")
+            out1 = _strip_decision_prefix(out1)
+            tool_calls = parse_tool_calls_loose(out1)
 
-        # 6) Tool execution
-        tool_called = None
-        tool_payload: dict[str, Any] | None = None
+            if force_no_tool:
+                tool_calls = []
 
-        if tool_call:
-            tool_called = tool_call["tool"]
-            args = tool_call["args"]
-            steps.append(f"tool_call:{tool_called}")
+            if not tool_calls and prefetch is not None:
+                steps.append("tool_prefetch_cancelled")
+                _discard(prefetch)
 
-            if tool_called == "scrape_category":
-                if "query" not in args and "categorie" in args:
-                    args["query"] = args.pop("categorie")
-                args.setdefault("limit", 8)
+            if not tool_calls and _looks_like_tool_json(out1):
+                out1 = "Je peux t’aider, mais j’ai besoin que tu précises un peu (type de lieu, quartier, ou ce que tu veux exactement)."
 
-            if tool_called == "scrape_events":
-                args.setdefault("limit", 20)
+        # 6) Tool execution (un ou plusieurs tools, en parallèle)
+        tools_called: list[str] = []
+        tool_payloads: list[dict[str, Any]] = []
 
-            try:
-                tool_payload = await self.mcp.call_tool(tool_called, args)
-            except Exception as e:
-                tool_payload = {"error": str(e)}
-                steps.append("tool_error")
+        if tool_calls:
+            calls = [(c["tool"], _tool_args(c["tool"], c["args"])) for c in tool_calls]
+            tools_called = [tool for tool, _ in calls]
+            steps.extend(f"tool_call:{tool}" for tool in tools_called)
+            tool_payloads = await self._call_tools(calls, steps, emit, prefetch, prefetch_key)
 
-            # --- Cas EVENTS : réponse directe sans LLM (plus fiable)
-            if tool_called == "scrape_events" and isinstance(tool_payload, dict):
-                items = tool_payload.get("items") or []
+            # --- Cas EVENTS seul : réponse directe sans LLM (plus fiable)
+            if tools_called == ["scrape_events"] and isinstance(tool_payloads[0], dict):
+                items = tool_payloads[0].get("items") or []
                 if isinstance(items, list):
                     items = _filter_events_for_query(user_message, items)
 
@@ -486,8 +794,7 @@ IMPORTANT:
 
                 answer = _strip_decision_prefix(answer)
 
-                history = history + [{"role": "user", "content": user_message}, {"role": "assistant", "content": answer}]
-                self.memory[conversation_id] = history[-12:]
+                await self._remember(conversation_id, history, user_message, answer, sent)
 
                 return {
                     "answer": answer,
@@ -499,11 +806,14 @@ IMPORTANT:
                         "latency_ms": int((time.time() - t0) * 1000),
                         "steps": steps + ["events_direct_answer"],
                         "errors": {},
+                        "ollama": llm_stats,
                     },
                 }
 
-            # Ajout sources depuis tool
-            if isinstance(tool_payload, dict):
+            # Ajout sources depuis les tools
+            for tool_payload in tool_payloads:
+                if not isinstance(tool_payload, dict):
+                    continue
                 for it in (tool_payload.get("items") or []):
                     if isinstance(it, dict) and it.get("url"):
                         sources.append({"type": "web", "url": it["url"]})
@@ -511,24 +821,39 @@ IMPORTANT:
                     sources.append({"type": "web", "url": tool_payload["item"]["url"]})
 
             steps.append("llm_pass2")
-            user_block_pass2 = f"""Message utilisateur: {user_message}
-
-{kb_summary}
-
-Résultat du tool ({tool_called}) (JSON):
-{tool_payload}
+            # budget de tokens partagé entre les résultats
+            budget = TOOL_RESULT_TOKEN_BUDGET // len(calls)
+            results = "\n\n".join(
+                f"Résultat du tool ({tool}) (un item par ligne):\n{pack_tool_result(payload, budget)}"
+                for tool, payload in zip(tools_called, tool_payloads)
+            )
+            tool_block = f"""{results}
 
 Tâche:
 - Produis UNIQUEMENT la réponse finale pour l'utilisateur.
 - NE PRODUIS AUCUN JSON.
 - NE FAIS AUCUN appel de tool.
-- Utilise UNIQUEMENT les éléments du tool_payload (items ou item).
+- Utilise UNIQUEMENT les items des résultats de tools.
 - Ne crée jamais de liens : uniquement ceux fournis.
 """
-            prompt2 = self._build_prompt(history, user_block_pass2)
+            if messages1 is not None:
+                # suite de la conversation de la pass 1: seul le résultat du tool est à évaluer
+                messages2 = messages1 + [
+                    {"role": "assistant", "content": out1},
+                    {"role": "user", "content": tool_block},
+                ]
+            else:
+                messages2 = self._build_messages(
+                    history, f"Message utilisateur: {user_message}\n\n{kb_summary}\n\n{tool_block}"
+                )
 
+            sent = messages2
             try:
-                answer = await self.ollama.generate(prompt=prompt2, system=SYSTEM_PROMPT)
+                answer, hit2 = await self._generate(
+                    messages2, emit, message=user_message, query_vec=query_vec, stats=llm_stats
+                )
+                if hit2:
+                    steps.append("llm_pass2_cache_hit")
             except Exception as e:
                 answer = "Le modèle IA est indisponible pour formuler la réponse. Réessaie dans un instant."
                 steps.append("ollama_error_pass2")
@@ -541,12 +866,12 @@ Tâche:
         answer = _strip_decision_prefix(answer)
 
         # Update mémoire
-        history = history + [{"role": "user", "content": user_message}, {"role": "assistant", "content": answer}]
-        self.memory[conversation_id] = history[-12:]
+        await self._remember(conversation_id, history, user_message, answer, sent)
 
         trace_errors: dict[str, str] = {}
-        if isinstance(tool_payload, dict) and tool_payload.get("error"):
-            trace_errors["tool_error"] = str(tool_payload.get("error"))
+        tool_errors = [str(p["error"]) for p in tool_payloads if isinstance(p, dict) and p.get("error")]
+        if tool_errors:
+            trace_errors["tool_error"] = "; ".join(tool_errors)
         if "err2" in locals():
             trace_errors["ollama_error"] = err2
 
@@ -562,10 +887,13 @@ Tâche:
             "sources": sources,
             "trace": {
                 "kb_used": have_kb_answer,
-                "tool_called": tool_called,
+                "tool_called": tools_called[0] if tools_called else None,
+                "tools_called": tools_called,
                 "model": self.ollama.model,
                 "latency_ms": int((time.time() - t0) * 1000),
                 "steps": steps,
                 "errors": trace_errors,
+                "llm_cache": self.llm_cache.stats(),
+                "ollama": llm_stats,
             },
         }
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-process, l'écriture reste atomique
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # le mode sémantique exige numpy, la recherche lexicale non
+    np = None
+
+
+EMBED_BATCH_SIZE = 32
+
+EmbedFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+def place_key(p: dict[str, Any], i: int) -> str:
+    return str(p.get("id") or p.get("url") or i)
+
+
+def place_text(p: dict[str, Any]) -> str:
+    """Texte embeddé pour un lieu (nom, type, quartier, thèmes, description)."""
+    parts = [
+        str(p.get("name") or ""),
+        str(p.get("type") or ""),
+        str(p.get("district") or ""),
+        ", ".join(p.get("themes", []) or []),
+        str(p.get("short_description") or ""),
+    ]
+    return " | ".join(x for x in parts if x)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VectorIndex:
+    """
+    Index vectoriel sur disque pour la KB.
+
+    - ids.json         : sidecar {model, dim, ids, hashes, vectors} (ligne k <-> ids[k])
+    - vectors.<h>.f32  : matrice float32 (n, dim) brute, lignes normalisées, mappée en mémoire;
+                         jamais réécrite: remplacer ids.json bascule vecteurs et ids ensemble
+
+    sync() ne ré-embed que les lieux nouveaux ou modifiés (hash du texte embeddé), sous
+    un verrou fichier: un seul worker embedde, les autres relisent ensuite son résultat.
+    """
+
+    def __init__(self, directory: str = "backend/data/embeddings"):
+        if np is None:
+            raise RuntimeError("numpy est requis pour la recherche sémantique")
+        self.dir = Path(directory)
+        self.model: Optional[str] = None
+        self.ids: list[str] = []
+        self.hashes: list[str] = []
+        self.matrix: Any = None
+        self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.dir / "ids.json"
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            ids = list(meta.get("ids") or [])
+            dim = int(meta.get("dim") or 0)
+            matrix = None
+            if ids and dim:
+                vec_path = self.dir / str(meta.get("vectors") or "vectors.f32")
+                matrix = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(len(ids), dim))
+        except (OSError, ValueError):
+            return
+        self.model = meta.get("model")
+        self.ids = ids
+        self.hashes = list(meta.get("hashes") or [])
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _todo(self, ids: list[str], hashes: list[str], model: str) -> tuple[dict[str, int], list[int]]:
+        """(ligne actuelle par id réutilisable, lieux à embedder)."""
+        old_rows: dict[str, int] = {}
+        if self.model == model and self.matrix is not None:
+            old_rows = {pid: k for k, pid in enumerate(self.ids) if k < len(self.hashes)}
+        todo = [
+            k for k, pid in enumerate(ids)
+            if pid not in old_rows or self.hashes[old_rows[pid]] != hashes[k]
+        ]
+        return old_rows, todo
+
+    async def sync(self, places: list[dict[str, Any]], embed: EmbedFn, model: str) -> int:
+        """Met l'index à jour pour `places`. Retourne le nombre de lieux (ré)embeddés."""
+        if not places:
+            return 0
+        ids = [place_key(p, i) for i, p in enumerate(places)]
+        texts = [place_text(p) for p in places]
+        hashes = [content_hash(t) for t in texts]
+
+        _, todo = self._todo(ids, hashes, model)
+        if not todo and ids == self.ids:
+            return 0
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / "ids.json.lock", "w") as lock:
+            if fcntl is not None:
+                await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            self._load()  # mis à jour par un autre worker pendant l'attente
+            old_rows, todo = self._todo(ids, hashes, model)
+            if not todo and ids == self.ids:
+                return 0
+
+            fresh: dict[int, Any] = {}
+            for a in range(0, len(todo), EMBED_BATCH_SIZE):
+                batch = todo[a:a + EMBED_BATCH_SIZE]
+                vecs = await embed([texts[k] for k in batch])
+                for k, v in zip(batch, vecs):
+                    fresh[k] = np.asarray(v, dtype=np.float32)
+
+            dim = next(iter(fresh.values())).shape[0] if fresh else self.matrix.shape[1]
+            mat = np.zeros((len(ids), dim), dtype=np.float32)
+            for k, pid in enumerate(ids):
+                v = fresh[k] if k in fresh else self.matrix[old_rows[pid]]
+                norm = float(np.linalg.norm(v))
+                mat[k] = v / norm if norm else v
+
+            self._write(mat, {"model": model, "dim": dim, "ids": ids, "hashes": hashes})
+        self._load()
+        return len(todo)
+
+    def _write(self, mat: Any, meta: dict[str, Any]) -> None:
+        """
+        Écrit la matrice sous un nouveau nom puis bascule ids.json (os.replace, atomique):
+        un lecteur voit l'ancien couple ou le nouveau, jamais un mélange. Appelé sous verrou.
+        """
+        pid = os.getpid()
+        name = f"vectors.{content_hash(json.dumps(meta, sort_keys=True))[:16]}.f32"
+        tmp_vec = self.dir / f"{name}.{pid}.tmp"
+        tmp_meta = self.dir / f"ids.json.{pid}.tmp"
+        mat.tofile(tmp_vec)
+        os.replace(tmp_vec, self.dir / name)
+        tmp_meta.write_text(json.dumps({**meta, "vectors": name}), encoding="utf-8")
+        os.replace(tmp_meta, self._meta_path)
+        # anciennes matrices: les workers qui les ont mappées gardent un mapping valide (POSIX)
+        for old in self.dir.glob("vectors*.f32"):
+            if old.name != name:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def similarities(self, query_vec: list[float]) -> Any:
+        """Cosinus entre la requête et toutes les lignes (un seul produit matrice-vecteur)."""
+        q = np.asarray(query_vec, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if self.matrix is None or not norm or q.shape[0] != self.matrix.shape[1]:
+            return np.zeros(len(self.ids), dtype=np.float32)
+        return self.matrix @ (q / norm)
+
+    @staticmethod
+    def top_k(sims: Any, k: int = 8) -> list[tuple[int, float]]:
+        """(ligne, score) des k meilleures similarités, triées par score décroissant."""
+        if not len(sims):
+            return []
+        k = min(k, len(sims))
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx], kind="stable")]
+        return [(int(i), float(sims[i])) for i in idx]
@@ -0,0 +1,105 @@
+import re
+from typing import Iterable, Iterator
+
+# Facettes de localisation: "arr:5e" (arrondissement) et "quartier:vieux lyon".
+# Chaque district de la KB est résolu une fois au chargement vers ses facettes.
+
+ARRONDISSEMENTS = ("1er", "2e", "3e", "4e", "5e", "6e", "7e", "8e", "9e")
+
+# quartier canonique -> (alias reconnus, arrondissements, quartiers parents)
+NEIGHBORHOODS: dict[str, tuple[tuple[str, ...], tuple[str, ...], tuple[str, ...]]] = {
+    "presqu'île": (("presqu'île", "presqu'ile", "presquile", "presqu île", "centre-ville"), ("1er", "2e"), ()),
+    "terreaux": (("terreaux",), ("1er",), ("presqu'île",)),
+    "bellecour": (("bellecour",), ("2e",), ("presqu'île",)),
+    "ainay": (("ainay",), ("2e",), ("presqu'île",)),
+    "perrache": (("perrache",), ("2e",), ("presqu'île",)),
+    "confluence": (("confluence",), ("2e",), ()),
+    "croix-rousse": (("croix-rousse", "croix rousse"), ("1er", "4e"), ()),
+    "vieux lyon": (("vieux lyon", "vieux-lyon"), ("5e",), ()),
+    "saint-jean": (("saint-jean", "saint jean"), ("5e",), ("vieux lyon",)),
+    "saint-paul": (("saint-paul", "saint paul"), ("5e",), ("vieux lyon",)),
+    "saint-georges": (("saint-georges", "saint georges"), ("5e",), ("vieux lyon",)),
+    "fourvière": (("fourvière", "fourviere"), ("5e",), ()),
+    "part-dieu": (("part-dieu", "part dieu"), ("3e",), ()),
+    "brotteaux": (("brotteaux",), ("6e",), ()),
+    "tête d'or": (("tête d'or", "tete d'or"), ("6e",), ()),
+    "guillotière": (("guillotière", "guillotiere"), ("7e",), ()),
+    "gerland": (("gerland",), ("7e",), ()),
+    "monplaisir": (("monplaisir",), ("8e",), ()),
+    "vaise": (("vaise",), ("9e",), ()),
+}
+
+# "6e", "6eme", "6ème", "dans le 6", "69006"
+_ARR_RE = re.compile(
+    r"\b(1er|[2-9]e)\b"
+    r"|\b([1-9])\s*(?:eme|ème)\b"
+    r"|\bdans\s+le\s+([1-9])\b"
+    r"|\b6900([1-9])\b",
+    re.IGNORECASE,
+)
+
+_ALIASES: list[tuple[str, str]] = sorted(
+    ((alias, hood) for hood, (aliases, _, _) in NEIGHBORHOODS.items() for alias in aliases),
+    key=lambda x: -len(x[0]),
+)
+
+
+def _arr_code(digit: str) -> str:
+    return "1er" if digit == "1" else f"{digit}e"
+
+
+def arrondissements_in(text: str) -> list[str]:
+    """Arrondissements cités dans un texte normalisé, dans l'ordre, sans doublon."""
+    out: list[str] = []
+    for m in _ARR_RE.finditer(text):
+        code = m.group(1).lower() if m.group(1) else _arr_code(next(g for g in m.groups()[1:] if g))
+        if code not in out:
+            out.append(code)
+    return out
+
+
+def neighborhoods_in(text: str) -> list[str]:
+    """Quartiers canoniques cités dans un texte normalisé (alias le plus long d'abord)."""
+    out: list[str] = []
+    for alias, hood in _ALIASES:
+        if alias in text and hood not in out:
+            out.append(hood)
+    return out
+
+
+def district_facets(district: str) -> set[str]:
+    """Facettes d'un district de la KB (déjà normalisé): arrondissements + quartiers + parents."""
+    facets = {f"arr:{a}" for a in arrondissements_in(district)}
+    todo = neighborhoods_in(district)
+    while todo:
+        hood = todo.pop()
+        if f"quartier:{hood}" in facets:
+            continue
+        facets.add(f"quartier:{hood}")
+        _, arrs, parents = NEIGHBORHOODS[hood]
+        facets.update(f"arr:{a}" for a in arrs)
+        todo.extend(parents)
+    return facets
+
+
+def query_location_facets(query: str) -> list[str]:
+    """Facettes de localisation demandées (combinées en OU): "dans le 5e ou le 2e"."""
+    return [f"arr:{a}" for a in arrondissements_in(query)] + [f"quartier:{h}" for h in neighborhoods_in(query)]
+
+
+# Bitsets: entier Python, bit i = lieu i
+
+def bitset(ids: Iterable[int], n: int) -> int:
+    buf = bytearray((n + 7) // 8)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def bitset_ids(bits: int) -> Iterator[int]:
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for k, byte in enumerate(raw):
+        while byte:
+            low = byte & -byte
+            yield (k << 3) + low.bit_length() - 1
+            byte ^= low
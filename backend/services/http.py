@@ -0,0 +1,28 @@
+import httpx
+
+try:
+    import h2  # noqa: F401  (extra httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def make_async_client(
+    max_connections: int = 20,
+    max_keepalive: int = 10,
+    keepalive_expiry: float = 60.0,
+    timeout_s: float = 30.0,
+) -> httpx.AsyncClient:
+    """
+    Client HTTP longue durée (pool de connexions keep-alive, HTTP/2 si h2 est installé).
+    Un seul par service distant, fermé au shutdown de l'app (voir backend/app.py).
+    """
+    return httpx.AsyncClient(
+        timeout=timeout_s,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        http2=HTTP2_AVAILABLE,
+    )
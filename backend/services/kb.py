@@ -1,33 +1,49 @@
+import hashlib
 import json
-import re
 from pathlib import Path
 from typing import Any, Optional
 
-# Detecte: "6e", "6eme", "6ème", "dans le 6", "6e arrondissement"
-_ARR_RE = re.compile(
-    r"\b(1er|2e|3e|4e|5e|6e|7e|8e|9e)\b"
-    r"|\b([1-9])\s*(?:eme|ème)\b"
-    r"|\bdans\s+le\s+([1-9])\b",
-    re.IGNORECASE,
+from backend.services.embeddings import VectorIndex, place_key
+from backend.services.facets import (
+    NEIGHBORHOODS,
+    arrondissements_in,
+    bitset,
+    bitset_ids,
+    district_facets,
+    query_location_facets,
 )
+from backend.services.keywords import infer_type
+from backend.services.kb_index import (
+    CSRMap,
+    IndexArtifact,
+    PlaceTable,
+    csr_arrays,
+    encode_places,
+    load_or_build,
+    open_artifact,
+    pack_strings,
+)
+from backend.services.places import Place
+from backend.services.ranking import FIELD_WEIGHTS, BM25Ranker, CountRanker, make_ranker
+
+_EXPAND_CACHE_MAX = 4096
+
+# KB compilée (lieux en colonnes + index), mappée en mémoire et partagée par les workers.
+# Construite par backend/scripts/build_kb.py ou au premier démarrage.
+KB_INDEX_PATH = "backend/data/kb.idx"
+
+# Recherche sémantique (optionnelle): candidats ajoutés et poids dans le score final
+SEMANTIC_TOP_K = 16
+SEMANTIC_MIN_SIM = 0.55
+SEMANTIC_WEIGHT = 4.0
 
 def _norm(s: str) -> str:
-    s = (s or "").lower().strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
+    return " ".join((s or "").lower().split())
 
 def extract_arrondissement(text: str) -> Optional[str]:
-    q = _norm(text)
-    m = _ARR_RE.search(q)
-    if not m:
-        return None
-    if m.group(1):  # "6e"
-        return m.group(1).lower()
-    if m.group(2):  # "6eme"/"6ème"
-        return f"{m.group(2)}e"
-    if m.group(3):  # "dans le 6"
-        return f"{m.group(3)}e"
-    return None
+    """Premier arrondissement cité: "6e", "6eme", "6ème", "dans le 6", "69006"."""
+    found = arrondissements_in(_norm(text))
+    return found[0] if found else None
 
 
 class KnowledgeBase:
@@ -37,86 +53,299 @@ class KnowledgeBase:
     Supporte 2 formats:
     - {"places":[ {...}, {...} ]}
     - [ {...}, {...} ]  (liste directe)
+
+    `ranker` choisit le moteur de score lexical (voir services/ranking.py):
+    "bm25" (défaut) ou "count" (ancien score +1 par token trouvé).
+
+    Si `index_path` est fourni, les lieux (en colonnes) et les index (postings,
+    filtres, matrice BM25) sont lus depuis un artefact binaire mappé en mémoire,
+    partagé entre workers (voir services/kb_index.py). Tant que kb.json n'a pas
+    bougé (mtime/taille), il n'est même pas relu; sinon on repart de kb.json et
+    l'artefact est reconstruit une seule fois.
     """
 
-    def __init__(self, path: str = "backend/data/kb.json"):
+    def __init__(
+        self,
+        path: str = "backend/data/kb.json",
+        ranker: str = "bm25",
+        index_path: Optional[str] = None,
+    ):
         p = Path(path)
-        raw = p.read_text(encoding="utf-8")
-        loaded = json.loads(raw)
-
-        # Robustesse: si le JSON est une LISTE -> on la met dans "places"
-        if isinstance(loaded, list):
-            self.places: list[dict[str, Any]] = loaded
-        elif isinstance(loaded, dict):
-            self.places = loaded.get("places", []) or []
+        self.path = p
+        st = p.stat()
+        self.mtime = st.st_mtime
+        self._source = [st.st_mtime_ns, st.st_size]
+        self.index_path = index_path
+        use_index = bool(index_path) and ranker in ("bm25", "count")
+
+        artifact = open_artifact(index_path) if use_index else None
+        if artifact is not None and self._artifact_fresh(artifact.meta):
+            self.content_hash = artifact.meta["content_hash"]
+        else:
+            # artefact absent ou périmé: repli sur kb.json (puis reconstruction)
+            raw = p.read_text(encoding="utf-8")
+            self.content_hash = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+            loaded = json.loads(raw)
+
+            # Robustesse: si le JSON est une LISTE -> on la met dans "places"
+            if isinstance(loaded, list):
+                raw_places = loaded
+            elif isinstance(loaded, dict):
+                raw_places = loaded.get("places", []) or []
+            else:
+                raw_places = []
+            # records à slots; le dict n'est reconstruit que pour les réponses
+            self.places: Any = [Place.from_dict(d) for d in raw_places]
+
+            artifact = None
+            if use_index:
+                artifact = load_or_build(index_path, self._artifact_valid, self._compile_index)
+
+        if artifact is not None:
+            self.places = PlaceTable(artifact)
+            self._load_index(artifact, ranker)
+        else:
+            self._build_index()
+            self.ranker = make_ranker(ranker, self._fields)
+        self.vectors: Optional[VectorIndex] = None
+
+    def is_stale(self) -> bool:
+        """True si le fichier KB a été modifié depuis le chargement."""
+        try:
+            return self.path.stat().st_mtime != self.mtime
+        except OSError:
+            return False
+
+    def _build_index(self) -> None:
+        """
+        Précalcule, une fois au chargement, les champs normalisés de chaque lieu
+        et un index inversé mot -> ids, pour que search() ne touche que les
+        lieux candidats au lieu de rescanner toute la KB.
+        """
+        self._by_type: dict[str, list[int]] = {}
+        self._by_district: dict[str, list[int]] = {}
+        self._postings: dict[str, list[int]] = {}
+        self._fields: list[dict[str, list[str]]] = []
+
+        for i, p in enumerate(self.places):
+            p_type = _norm(str(p.get("type", "")))
+            p_district = _norm(str(p.get("district", "")))
+            self._by_type.setdefault(p_type, []).append(i)
+            self._by_district.setdefault(p_district, []).append(i)
+
+            fields = {
+                "name": _norm(str(p.get("name", ""))).split(),
+                "district": p_district.split(),
+                "themes": _norm(" ".join(p.get("themes", []) or [])).split(),
+                "short_description": _norm(str(p.get("short_description", ""))).split(),
+            }
+            self._fields.append(fields)
+            for w in set(w for words in fields.values() for w in words):
+                self._postings.setdefault(w, []).append(i)
+
+        self._vocab = list(self._postings)
+        self._reset_caches()
+
+    def _reset_caches(self) -> None:
+        self._expand_cache: dict[str, list[str]] = {}
+        self._build_facets()
+
+    def _build_facets(self) -> None:
+        """
+        Bitsets par facette ("type:museum", "arr:5e", "quartier:vieux lyon").
+        Chaque district distinct est résolu une fois vers ses arrondissements et
+        quartiers (voir services/facets.py): les filtres deviennent des & / |.
+        """
+        n = len(self.places)
+        self._facets: dict[str, int] = {f"type:{t}": bitset(ids, n) for t, ids in self._by_type.items()}
+        acc: dict[str, list[int]] = {}
+        for p_district, ids in self._by_district.items():
+            for facet in district_facets(p_district):
+                acc.setdefault(facet, []).extend(ids)
+        for facet, ids in acc.items():
+            self._facets[facet] = bitset(ids, n)
+
+    def _neighborhood_bonus(self, hoods: list[str]) -> dict[int, float]:
+        """
+        Bonus (et non filtre) pour les quartiers cités: +2 aux lieux du quartier,
+        +1 à ceux de ses arrondissements. Beaucoup de lieux n'ont qu'un arrondissement,
+        voire pas de district: ils restent candidats.
+        """
+        hood_bits = 0
+        arr_bits = 0
+        for facet in hoods:
+            hood_bits |= self._facets.get(facet, 0)
+            _, arrs, _ = NEIGHBORHOODS[facet.split(":", 1)[1]]
+            for a in arrs:
+                arr_bits |= self._facets.get(f"arr:{a}", 0)
+        bonus = dict.fromkeys(bitset_ids(arr_bits & ~hood_bits), 1.0)
+        bonus.update(dict.fromkeys(bitset_ids(hood_bits), 2.0))
+        return bonus
+
+    def _artifact_fresh(self, meta: dict[str, Any]) -> bool:
+        """Artefact compilé depuis kb.json dans son état actuel (mtime/taille)."""
+        return meta.get("source") == self._source and meta.get("field_weights") == FIELD_WEIGHTS
+
+    def _artifact_valid(self, meta: dict[str, Any]) -> bool:
+        return (
+            self._artifact_fresh(meta)
+            and meta.get("content_hash") == self.content_hash
+            and meta.get("n_places") == len(self.places)
+        )
+
+    def _compile_index(self) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Construit les index en mémoire puis les sérialise pour l'artefact partagé."""
+        self._build_index()
+        bm25 = BM25Ranker(self._fields)
+        terms = bm25.terms()
+        vocab = terms + [w for w in self._postings if w not in bm25.term_ids]
+
+        arrays: dict[str, Any] = encode_places([p.to_dict() for p in self.places])
+        for name, mapping in (
+            ("postings", {w: self._postings[w] for w in vocab}),
+            ("types", self._by_type),
+            ("districts", self._by_district),
+        ):
+            keys, ptr, ids = csr_arrays(mapping)
+            table = pack_strings(keys)
+            arrays[f"{name}.keys.blob"] = table["blob"]
+            arrays[f"{name}.keys.offsets"] = table["offsets"]
+            arrays[f"{name}.ptr"] = ptr
+            arrays[f"{name}.ids"] = ids
+        arrays["bm25.ptr"] = bm25._ptr
+        arrays["bm25.doc_idx"] = bm25._doc_idx
+        arrays["bm25.tfn"] = bm25._tfn
+
+        meta = {
+            "content_hash": self.content_hash,
+            "source": self._source,
+            "field_weights": FIELD_WEIGHTS,
+            "n_places": len(self.places),
+            "bm25_terms": len(terms),
+            "k1": bm25.k1,
+            "b": bm25.b,
+        }
+        return meta, arrays
+
+    def _load_index(self, art: IndexArtifact, ranker: str) -> None:
+        """Index en vues sur l'artefact mappé: seules les clés sont copiées par worker."""
+        maps = {
+            name: CSRMap(art.strings(f"{name}.keys"), art[f"{name}.ptr"], art[f"{name}.ids"])
+            for name in ("postings", "types", "districts")
+        }
+        self._postings = maps["postings"]
+        self._by_type = maps["types"]
+        self._by_district = maps["districts"]
+        self._fields = []  # inutile une fois la matrice BM25 mappée
+        self._vocab = list(self._postings)
+        self._reset_caches()
+
+        meta = art.meta
+        n = len(self.places)
+        if ranker == "count":
+            self.ranker = CountRanker.from_postings(n, self._postings)
         else:
-            self.places = []
+            self.ranker = BM25Ranker.from_arrays(
+                n, self._vocab[:meta["bm25_terms"]],
+                art["bm25.ptr"], art["bm25.doc_idx"], art["bm25.tfn"],
+                k1=meta["k1"], b=meta["b"],
+            )
+
+    def warmup(self) -> None:
+        """Précharge les pages de l'index et le ranker (démarrage)."""
+        self.search("musée restaurant parc patrimoine lyon")
+
+    def _expand_token(self, token: str) -> list[str]:
+        """Mots du vocabulaire contenant `token` (équivaut au test `token in hay`)."""
+        words = self._expand_cache.get(token)
+        if words is None:
+            words = [w for w in self._vocab if token in w]
+            if len(self._expand_cache) >= _EXPAND_CACHE_MAX:
+                self._expand_cache.clear()
+            self._expand_cache[token] = words
+        return words
+
+    def attach_vectors(self, index: VectorIndex) -> bool:
+        """Active la recherche sémantique si l'index est aligné sur self.places."""
+        if index.ids != [place_key(p, i) for i, p in enumerate(self.places)]:
+            return False
+        self.vectors = index
+        return True
 
     def _infer_type(self, q: str) -> Optional[str]:
-        q = _norm(q)
-        if any(w in q for w in ["restaurant", "resto", "manger", "déjeuner", "dejeuner", "diner", "dîner", "brasserie", "bouchon"]):
-            return "restaurant"
-        if any(w in q for w in ["musée", "musee", "expo", "exposition", "galerie"]):
-            return "museum"
-        if any(w in q for w in ["parc", "jardin", "nature", "balade", "promenade"]):
-            return "park"
-        if any(w in q for w in ["patrimoine", "monument", "basilique", "cathédrale", "cathedrale", "vieux lyon", "fourvière", "fourviere"]):
-            return "heritage"
-        return None
-
-    def search(self, message: str, limit: int = 8) -> dict[str, Any]:
+        return infer_type(_norm(q))
+
+    def search(
+        self,
+        message: str,
+        limit: int = 8,
+        query_vec: Optional[list[float]] = None,
+    ) -> dict[str, Any]:
+        """
+        Recherche lexicale (facettes type/localisation + ranker).
+        Type et arrondissements explicites filtrent: plusieurs arrondissements se
+        combinent en OU ("musée dans le 5e ou le 2e"), puis en ET avec le type.
+        Un quartier cité ("vieux lyon", "tête d'or") ne filtre pas, il donne un bonus.
+        Si `query_vec` (embedding du message) est fourni et qu'un index est attaché,
+        les lieux sémantiquement proches sont ajoutés et le cosinus entre dans le score.
+        """
         q = _norm(message)
         want_type = self._infer_type(q)
-        want_arr = extract_arrondissement(q)  # ex: "6e"
+        want_loc = query_location_facets(q)  # ex: ["arr:5e", "quartier:vieux lyon"]
+        want_arr = [f for f in want_loc if f.startswith("arr:")]
+        want_hood = [f for f in want_loc if f.startswith("quartier:")]
 
         tokens = [t for t in q.split() if len(t) >= 3]
-        scored: list[tuple[int, dict[str, Any]]] = []
+        groups = [self._expand_token(t) for t in tokens]
+        bonus: dict[int, float] = {}
 
-        for p in self.places:
-            p_type = _norm(str(p.get("type", "")))
-            p_district = _norm(str(p.get("district", "")))
+        # facettes -> ensemble de candidats autorisés
+        allowed_bits: Optional[int] = None
+        if want_type:
+            allowed_bits = self._facets.get(f"type:{want_type}", 0)
+        if want_arr:
+            arr_bits = 0
+            for facet in want_arr:
+                arr_bits |= self._facets.get(facet, 0)
+            allowed_bits = arr_bits if allowed_bits is None else (allowed_bits & arr_bits)
+        allowed = set(bitset_ids(allowed_bits)) if allowed_bits is not None else None
+
+        # bonus: +2 type, +2 arrondissement (tous les lieux autorisés restent candidats)
+        if allowed:
+            bonus = dict.fromkeys(allowed, 2.0 * bool(want_type) + 2.0 * bool(want_arr))
+        if want_hood:
+            for i, b in self._neighborhood_bonus(want_hood).items():
+                if allowed is None or i in allowed:
+                    bonus[i] = bonus.get(i, 0.0) + b
+
+        candidates: set[int] = set(bonus)
+        hits: set[int] = set()
+        for words in groups:
+            for w in words:
+                hits.update(self._postings[w])
+        if allowed is not None:
+            hits &= allowed
+        candidates |= hits
+
+        sims = None
+        if query_vec is not None and self.vectors is not None:
+            sims = self.vectors.similarities(query_vec)
+            for i, sim in self.vectors.top_k(sims, SEMANTIC_TOP_K):
+                if sim >= SEMANTIC_MIN_SIM and (allowed is None or i in allowed):
+                    candidates.add(i)
+
+        if not candidates:
+            return {"items": []}
+
+        lexical = self.ranker.score(groups) if hits else None
+        scores: dict[int, float] = {}
+        for i in candidates:
+            sc = bonus.get(i, 0.0) + (float(lexical[i]) if lexical is not None else 0.0)
+            if sims is not None:
+                sc += SEMANTIC_WEIGHT * max(float(sims[i]), 0.0)
+            if sc > 0:
+                scores[i] = sc
 
-            # filtre
-            if want_type and p_type != want_type:
-                continue
-
-            if want_arr:
-                ok_arr = (
-                    want_arr in p_district
-                    or f"lyon {want_arr}" in p_district
-                    or f"{want_arr} arrondissement" in p_district
-                    or (want_arr == "6e" and "69006" in p_district)
-                    or (want_arr == "5e" and "69005" in p_district)
-                    or (want_arr == "4e" and "69004" in p_district)
-                    or (want_arr == "3e" and "69003" in p_district)
-                    or (want_arr == "2e" and "69002" in p_district)
-                    or (want_arr == "1er" and "69001" in p_district)
-                    or (want_arr == "7e" and "69007" in p_district)
-                    or (want_arr == "8e" and "69008" in p_district)
-                    or (want_arr == "9e" and "69009" in p_district)
-                )
-                if not ok_arr:
-                    continue
-
-            hay = _norm(" ".join([
-                str(p.get("name", "")),
-                str(p.get("district", "")),
-                " ".join(p.get("themes", []) or []),
-                str(p.get("short_description", "")),
-            ]))
-
-            score = 0
-            if want_type and p_type == want_type:
-                score += 2
-            if want_arr and want_arr in p_district:
-                score += 2
-            for t in tokens:
-                if t in hay:
-                    score += 1
-
-            if score > 0:
-                scored.append((score, p))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        items = [p for _, p in scored[:limit]]
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        items = [self.places[i].to_dict() for i in ranked[:limit]]
         return {"items": items}
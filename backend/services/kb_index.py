@@ -0,0 +1,336 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from collections.abc import Sequence
+from typing import Any, Callable, Iterator, Optional
+
+from backend.services.places import PLACE_FIELDS, Place
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-process, la construction reste atomique
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # sans numpy, la KB reconstruit ses index en mémoire à chaque démarrage
+    np = None
+
+
+# Fichier: MAGIC | version (u32) | taille de l'en-tête (u64) | en-tête JSON | tableaux alignés
+MAGIC = b"LYKB"
+FORMAT_VERSION = 2
+ALIGN = 16
+_PREFIX = struct.Struct("<4sIQ")
+
+
+def pack_strings(strings: list[str]) -> dict[str, Any]:
+    """Table de chaînes: blob UTF-8 concaténé + offsets (n + 1)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return {"blob": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+
+def unpack_strings(blob: Any, offsets: Any) -> list[str]:
+    raw = blob.tobytes()
+    bounds = offsets.tolist()
+    return [raw[a:z].decode("utf-8") for a, z in zip(bounds, bounds[1:])]
+
+
+class StringTable:
+    """Table de chaînes de l'artefact, décodée à la demande (une chaîne à la fois)."""
+
+    def __init__(self, blob: Any, offsets: Any):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, j: int) -> str:
+        return self._blob[self._offsets[j]:self._offsets[j + 1]].tobytes().decode("utf-8")
+
+
+class CSRMap:
+    """
+    Vue dict-like clé -> liste d'ids sur un couple (ptr, ids) au format CSR.
+    Les tableaux restent dans le mapping partagé; seules les clés sont en mémoire.
+    """
+
+    def __init__(self, keys: list[str], ptr: Any, ids: Any):
+        self._keys = keys
+        self._index = {k: j for j, k in enumerate(keys)}
+        self._ptr = ptr
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: str) -> list[int]:
+        j = self._index[key]
+        return self._ids[self._ptr[j]:self._ptr[j + 1]].tolist()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._index else default
+
+    def items(self) -> Iterator[tuple[str, list[int]]]:
+        for k in self._keys:
+            yield k, self[k]
+
+
+def csr_arrays(mapping: dict[str, list[int]]) -> tuple[list[str], Any, Any]:
+    keys = list(mapping)
+    ptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(mapping[k]) for k in keys])
+    ids = np.fromiter((i for k in keys for i in mapping[k]), dtype=np.int32, count=int(ptr[-1]))
+    return keys, ptr, ids
+
+
+class IndexArtifact:
+    """
+    Artefact binaire en lecture seule, mappé en mémoire (mmap): les pages sont
+    partagées par tous les workers qui ouvrent le même fichier.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"artefact KB invalide: {path}")
+        header = json.loads(self._mm[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+        self.meta: dict[str, Any] = header["meta"]
+        base = _aligned(_PREFIX.size + header_len)
+        self.arrays: dict[str, Any] = {}
+        for name, (dtype, count, offset) in header["arrays"].items():
+            if count == 0:
+                self.arrays[name] = np.empty(0, dtype=np.dtype(dtype))
+            else:
+                self.arrays[name] = np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=base + offset)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.arrays[name]
+
+    def strings(self, name: str) -> list[str]:
+        return unpack_strings(self.arrays[f"{name}.blob"], self.arrays[f"{name}.offsets"])
+
+    def table(self, name: str) -> StringTable:
+        return StringTable(self.arrays[f"{name}.blob"], self.arrays[f"{name}.offsets"])
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_artifact(path: str, meta: dict[str, Any], arrays: dict[str, Any]) -> None:
+    """Écrit l'artefact de façon atomique (tmp + os.replace)."""
+    layout: dict[str, tuple[str, int, int]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = (arr.dtype.str, int(arr.size), offset)
+        offset = _aligned(offset + arr.nbytes)
+    header = json.dumps({"meta": meta, "arrays": layout}, ensure_ascii=False).encode("utf-8")
+
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        base = _aligned(_PREFIX.size + len(header))
+        for name, arr in arrays.items():
+            f.seek(base + layout[name][2])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, p)
+
+
+def open_artifact(path: str) -> Optional[IndexArtifact]:
+    """Mappe l'artefact existant (None si absent, illisible ou numpy indisponible)."""
+    if np is None:
+        return None
+    try:
+        return IndexArtifact(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def load_or_build(
+    path: str,
+    is_valid: Callable[[dict[str, Any]], bool],
+    build: Callable[[], tuple[dict[str, Any], dict[str, Any]]],
+) -> Optional[IndexArtifact]:
+    """
+    Mappe l'artefact s'il est valide, sinon le (re)construit.
+    Un verrou fichier garantit qu'un seul worker construit; les autres attendent
+    puis mappent le fichier produit. Renvoie None si numpy est absent ou en cas d'erreur.
+    """
+    if np is None:
+        return None
+
+    def _open() -> Optional[IndexArtifact]:
+        art = open_artifact(path)
+        return art if art is not None and is_valid(art.meta) else None
+
+    art = _open()
+    if art is not None:
+        return art
+
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            art = _open()  # construit par un autre worker pendant l'attente
+            if art is None:
+                meta, arrays = build()
+                write_artifact(path, meta, arrays)
+                art = _open()
+    except OSError:
+        return None
+    return art
+
+
+# Lieux stockés en colonnes: chaque colonne texte est une table de valeurs distinctes
+# + un code int32 par lieu (ABSENT: clé manquante, NULL: valeur null).
+ABSENT = -1
+NULL = -2
+
+
+def _intern(table: dict[str, int], value: str) -> int:
+    code = table.get(value)
+    if code is None:
+        code = table[value] = len(table)
+    return code
+
+
+def encode_places(places: list[dict[str, Any]]) -> dict[str, Any]:
+    """Tableaux colonnes des lieux. Les valeurs hors schéma partent en JSON dans `extras`."""
+    scalar_fields = [f for f in PLACE_FIELDS if f != "themes"]
+    tables: dict[str, dict[str, int]] = {f: {} for f in PLACE_FIELDS + ("extras",)}
+    codes: dict[str, list[int]] = {f: [] for f in scalar_fields + ["extras"]}
+    themes_ptr = [0]
+    themes_codes: list[int] = []
+    themes_present: list[int] = []
+
+    for p in places:
+        extras: dict[str, Any] = {}
+        for f in scalar_fields:
+            v = p.get(f, extras)
+            if v is extras:
+                codes[f].append(ABSENT)
+            elif v is None:
+                codes[f].append(NULL)
+            elif isinstance(v, str):
+                codes[f].append(_intern(tables[f], v))
+            else:
+                codes[f].append(ABSENT)
+                extras[f] = v
+
+        themes = p.get("themes", extras)
+        if isinstance(themes, list) and all(isinstance(t, str) for t in themes):
+            themes_present.append(1)
+            themes_codes.extend(_intern(tables["themes"], t) for t in themes)
+        else:
+            themes_present.append(0)
+            if themes is not extras:
+                extras["themes"] = themes
+        themes_ptr.append(len(themes_codes))
+
+        for k, v in p.items():
+            if k not in PLACE_FIELDS:
+                extras[k] = v
+        codes["extras"].append(
+            _intern(tables["extras"], json.dumps(extras, ensure_ascii=False)) if extras else ABSENT
+        )
+
+    arrays: dict[str, Any] = {}
+    for f, table in tables.items():
+        packed = pack_strings(list(table))
+        arrays[f"col.{f}.keys.blob"] = packed["blob"]
+        arrays[f"col.{f}.keys.offsets"] = packed["offsets"]
+    for f, col in codes.items():
+        arrays[f"col.{f}.codes"] = np.asarray(col, dtype=np.int32)
+    arrays["col.themes.ptr"] = np.asarray(themes_ptr, dtype=np.int64)
+    arrays["col.themes.codes"] = np.asarray(themes_codes, dtype=np.int32)
+    arrays["col.themes.present"] = np.asarray(themes_present, dtype=np.uint8)
+    return arrays
+
+
+# Colonnes à faible cardinalité: tables décodées une fois (chaînes internées)
+_INTERNED_COLUMNS = ("type", "district")
+
+
+class PlaceTable(Sequence):
+    """
+    Lieux lus depuis les colonnes de l'artefact: rien n'est gardé en mémoire par lieu,
+    chaque accès reconstruit un Place (name/description/url décodés à la demande).
+    """
+
+    def __init__(self, art: IndexArtifact):
+        self._n = len(art["col.extras.codes"])
+        self._cols: dict[str, tuple[Any, Any]] = {
+            f: (art.table(f"col.{f}.keys"), art[f"col.{f}.codes"])
+            for f in PLACE_FIELDS + ("extras",) if f != "themes"
+        }
+        for f in _INTERNED_COLUMNS:
+            table, codes = self._cols[f]
+            self._cols[f] = ([sys.intern(table[j]) for j in range(len(table))], codes)
+        themes = art.table("col.themes.keys")
+        self._themes = [sys.intern(themes[j]) for j in range(len(themes))]
+        self._themes_ptr = art["col.themes.ptr"]
+        self._themes_codes = art["col.themes.codes"]
+        self._themes_present = art["col.themes.present"]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[Place]:
+        for i in range(self._n):
+            yield self._place(i)
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self._place(k) for k in range(*i.indices(self._n))]
+        i = int(i)
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._place(i)
+
+    def _place(self, i: int) -> Place:
+        values: dict[str, Any] = {}
+        for f in PLACE_FIELDS:
+            if f == "themes":
+                if self._themes_present[i]:
+                    a, z = self._themes_ptr[i], self._themes_ptr[i + 1]
+                    values["themes"] = tuple(self._themes[c] for c in self._themes_codes[a:z].tolist())
+                continue
+            table, codes = self._cols[f]
+            code = int(codes[i])
+            if code >= 0:
+                values[f] = table[code]
+            elif code == NULL:
+                values[f] = None
+
+        table, codes = self._cols["extras"]
+        code = int(codes[i])
+        extras = json.loads(table[code]) if code >= 0 else None
+        if extras:
+            # valeurs hors schéma d'un champ connu (ex: themes non liste)
+            for f in PLACE_FIELDS:
+                if f in extras:
+                    values[f] = extras.pop(f)
+        return Place(**values, extras=extras)
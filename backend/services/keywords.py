@@ -0,0 +1,173 @@
+from functools import lru_cache
+from typing import Iterable
+
+# Mots-clés de détection d'intention. Toutes les tables sont compilées au chargement
+# en un seul automate Aho–Corasick: un passage sur le message donne toutes les
+# catégories présentes (test `mot in texte`, comme avant).
+
+TOURISM_KEYWORDS = {
+    # intention générale
+    "visiter", "visite", "voir", "découvrir", "decouvrir", "faire", "sortir", "idées", "idees",
+    "programme", "itinéraire", "itineraire", "plan", "conseil", "recommandation", "reco",
+    "top", "meilleur", "incontournable", "must", "que faire", "quoi faire",
+
+    # temps / planning
+    "aujourd'hui", "aujourdhui", "demain", "ce soir", "ce midi", "cet après-midi", "cet apres midi",
+    "ce week-end", "ce weekend", "week-end", "weekend", "cette semaine", "la semaine",
+    "samedi", "dimanche", "matin", "après-midi", "apres-midi", "soir", "nuit",
+    "2 jours", "deux jours", "3 jours", "trois jours",
+
+    # culture / sorties
+    "musée", "musee", "musées", "musees", "expo", "exposition", "expositions", "galerie",
+    "théâtre", "theatre", "spectacle", "cinéma", "cinema", "opéra", "opera",
+    "concert", "festival", "événement", "evenement", "événements", "evenements", "agenda",
+
+    # manger / boire
+    "restaurant", "resto", "bouchon", "brasserie", "bar", "pub", "café", "cafe", "terrasse",
+    "manger", "bouffer", "déjeuner", "dejeuner", "dîner", "diner", "goûter", "gouter",
+    "petit-déj", "petit dej", "petit déjeuner", "petit dejeuner",
+    "menu", "carte", "réserver", "reserver", "apéro", "apero", "cocktail", "bière", "biere",
+    "végétarien", "vegetarien", "vegan", "halal", "sans gluten",
+
+    # balades / nature
+    "balade", "promenade", "rando", "randonnée", "randonnee", "marche", "courir",
+    "parc", "jardin", "forêt", "foret", "nature", "point de vue", "coucher de soleil",
+    "quais", "berges", "rive", "pont",
+
+    # shopping / loisirs
+    "shopping", "boutique", "marché", "marche", "brocante", "vide-grenier", "vide grenier",
+    "loisir", "activité", "activite", "escape game", "bowling", "patinoire",
+
+    # patrimoine
+    "patrimoine", "monument", "basilique", "cathédrale", "cathedrale", "église", "eglise",
+    "place", "rue", "quartier", "traboule", "fourvière", "fourviere", "vieux-lyon", "vieux lyon",
+    "histoire", "architecture",
+
+    # infos variables
+    "adresse", "horaires", "horaire", "ouverture", "ouvert", "fermé", "ferme",
+    "tarif", "tarifs", "prix", "billet", "tickets", "réservation", "reservation",
+}
+
+# Lyon / quartiers
+LYON_KEYWORDS = {
+    "lyon", "grand lyon", "métropole", "metropole",
+    "presqu'île", "presquile", "vieux-lyon", "vieux lyon", "croix-rousse", "croix rousse",
+    "confluence", "part-dieu", "part dieu", "bellecour", "terreaux", "hotel de ville",
+    "fourvière", "fourviere", "saône", "saone", "rhône", "rhone", "tête d'or", "tete d'or",
+    "guillotière", "guillotiere", "brotteaux", "monplaisir", "gerland", "vaise", "perrache",
+    "saint-jean", "saint paul", "saint-georges", "saint georges",
+    "caluire", "villeurbanne", "oullins", "bron", "venissieux",
+    "vaulx-en-velin", "vaulx", "decines", "meyzieu",
+}
+
+# Informations variables (horaires, prix, agenda): nécessitent le site en direct
+LIVE_DATA_KEYWORDS = {
+    "horaire", "horaires", "ouvert", "ouverture",
+    "adresse", "où se trouve", "comment y aller", "accès", "acces",
+    "tarif", "tarifs", "prix", "billet", "tickets",
+    "événement", "evenement", "événements", "evenements", "agenda",
+    "aujourd", "ce week", "ce weekend", "ce week-end", "demain",
+}
+
+# Prépositions de lieu ("dans le 6e", "près de Bellecour")
+NEAR_WORDS = {"dans", "à", "au", "aux", "vers", "près", "proche"}
+
+# Routage direct vers un tool (voir services/router.py)
+EVENT_KEYWORDS = {
+    "événement", "evenement", "agenda", "concert", "festival", "spectacle",
+    "expo temporaire", "exposition temporaire", "fête", "fete", "programmation",
+}
+WHEN_KEYWORDS = {
+    "aujourd", "demain", "ce soir", "ce week", "ce weekend", "cette semaine", "samedi", "dimanche",
+}
+DISCOVER_KEYWORDS = {
+    "que faire", "quoi faire", "quoi visiter", "que visiter", "idées", "idees", "idée", "idee",
+    "lieux à voir", "lieux a voir", "à voir", "a voir", "incontournable",
+}
+PLACE_INFO_KEYWORDS = {
+    "horaire", "ouvert", "ouverture", "fermé", "ferme", "adresse", "où se trouve", "ou se trouve",
+    "comment y aller", "accès", "acces", "tarif", "prix", "billet", "réserv", "reserv",
+}
+
+# Type de lieu de la KB, par priorité (le premier type trouvé l'emporte)
+TYPE_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "restaurant": ("restaurant", "resto", "manger", "déjeuner", "dejeuner", "diner", "dîner", "brasserie", "bouchon"),
+    "museum": ("musée", "musee", "expo", "exposition", "galerie"),
+    "park": ("parc", "jardin", "nature", "balade", "promenade"),
+    "heritage": ("patrimoine", "monument", "basilique", "cathédrale", "cathedrale", "vieux lyon", "fourvière", "fourviere"),
+}
+
+
+class KeywordMatcher:
+    """
+    Automate Aho–Corasick sur des mots-clés rangés par catégorie.
+    categories(text) renvoie les catégories dont au moins un mot-clé apparaît
+    comme sous-chaîne de `text`, en un seul parcours du texte.
+    """
+
+    def __init__(self, keywords: dict[str, Iterable[str]]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[set[str]] = [set()]
+        for category, words in keywords.items():
+            for word in words:
+                state = 0
+                for ch in word:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = goto[state][ch] = len(goto)
+                        goto.append({})
+                        out.append(set())
+                    state = nxt
+                out[state].add(category)
+
+        # liens d'échec (BFS) puis table de transitions complète: chaque état hérite
+        # des transitions de son état d'échec, le parcours n'a plus jamais à reculer
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+                queue.append(nxt)
+
+        self._delta = delta
+        self._out = [frozenset(o) for o in out]
+
+    def categories(self, text: str) -> frozenset[str]:
+        delta, out = self._delta, self._out
+        found: set[str] = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return frozenset(found)
+
+
+MATCHER = KeywordMatcher({
+    "tourism": TOURISM_KEYWORDS,
+    "lyon": LYON_KEYWORDS,
+    "live": LIVE_DATA_KEYWORDS,
+    "near": NEAR_WORDS,
+    "events": EVENT_KEYWORDS,
+    "when": WHEN_KEYWORDS,
+    "discover": DISCOVER_KEYWORDS,
+    "place_info": PLACE_INFO_KEYWORDS,
+    **{f"type:{t}": words for t, words in TYPE_KEYWORDS.items()},
+})
+
+
+@lru_cache(maxsize=1024)
+def keyword_categories(text: str) -> frozenset[str]:
+    """Catégories de mots-clés présentes dans `text` (mis en cache: agent et KB partagent le résultat)."""
+    return MATCHER.categories(text)
+
+
+def infer_type(text: str) -> str | None:
+    cats = keyword_categories(text)
+    for t in TYPE_KEYWORDS:
+        if f"type:{t}" in cats:
+            return t
+    return None
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from backend.services.cache import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-process, save() reste atomique
+    fcntl = None
+
+
+def _sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def _norm_prompt(s: str) -> str:
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _unit(vec: list[float]) -> list[float]:
+    n = math.sqrt(sum(x * x for x in vec))
+    return [x / n for x in vec] if n else []
+
+
+class LLMCache:
+    """
+    Cache des générations Ollama.
+
+    - exact: clé (modèle, hash du system prompt, prompt normalisé), TTL + LRU
+    - similaire (optionnel): pour un même "scope" (le prompt sans le message
+      utilisateur: historique, KB_ITEMS, résultat de tool), on réutilise la réponse
+      d'une question dont l'embedding est assez proche (cosinus >= sim_threshold)
+    - persistance disque optionnelle (JSON), chargée au démarrage, écrite par save()
+      en fusionnant avec le fichier (plusieurs workers partagent le même chemin)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_s: float = 3600.0,
+        sim_threshold: float = 0.95,
+        max_per_scope: int = 32,
+        path: Optional[str] = None,
+    ):
+        self.ttl_s = ttl_s
+        self.sim_threshold = sim_threshold
+        self.max_per_scope = max_per_scope
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.exact = LRUCache(max_entries=max_entries, ttl_s=ttl_s)
+        # scope -> [(ts, vecteur unitaire, réponse)]
+        self._similar: "OrderedDict[str, list[tuple[float, list[float], str]]]" = OrderedDict()
+        self.similar_hits = 0
+        self._load()
+
+    def _key(self, model: str, system: str, prompt: str) -> str:
+        return _sha1(f"{model}\x00{_sha1(system)}\x00{_norm_prompt(prompt)}")
+
+    def _scope(self, model: str, system: str, prompt: str, message: str) -> str:
+        return _sha1(f"{model}\x00{_sha1(system)}\x00{_norm_prompt(prompt.replace(message, chr(0)))}")
+
+    def get(self, model: str, system: str, prompt: str) -> Optional[str]:
+        return self.exact.get(self._key(model, system, prompt))
+
+    def get_similar(
+        self,
+        model: str,
+        system: str,
+        prompt: str,
+        message: str,
+        vec: list[float],
+    ) -> Optional[str]:
+        entries = self._similar.get(self._scope(model, system, prompt, message))
+        q = _unit(vec)
+        if not entries or not q:
+            return None
+
+        now = time.time()
+        best, best_sim = None, self.sim_threshold
+        for ts, v, response in entries:
+            if now - ts > self.ttl_s or len(v) != len(q):
+                continue
+            sim = sum(a * b for a, b in zip(q, v))
+            if sim >= best_sim:
+                best, best_sim = response, sim
+        if best is not None:
+            self.similar_hits += 1
+        return best
+
+    def set(
+        self,
+        model: str,
+        system: str,
+        prompt: str,
+        response: str,
+        message: Optional[str] = None,
+        vec: Optional[list[float]] = None,
+    ) -> None:
+        self.exact.set(self._key(model, system, prompt), response)
+        if message and vec:
+            scope = self._scope(model, system, prompt, message)
+            entries = self._similar.setdefault(scope, [])
+            entries.append((time.time(), _unit(vec), response))
+            del entries[:-self.max_per_scope]
+            self._similar.move_to_end(scope)
+            while len(self._similar) > self.max_entries:
+                self._similar.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {**self.exact.stats(), "similar_hits": self.similar_hits}
+
+    def _read(self) -> dict[str, Any]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _fresh(
+        self,
+        exact: list[tuple[str, float, str]],
+        similar: dict[str, list[tuple[float, list[float], str]]],
+    ) -> tuple[list[tuple[str, float, str]], list[tuple[str, list[tuple[float, list[float], str]]]]]:
+        """Entrées non expirées, les plus récentes seulement (max_entries), par date croissante."""
+        now = time.time()
+        latest: dict[str, tuple[float, str]] = {}
+        for key, ts, response in exact:
+            if now - ts <= self.ttl_s and (key not in latest or ts > latest[key][0]):
+                latest[key] = (ts, response)
+        kept_exact = sorted(((k, ts, r) for k, (ts, r) in latest.items()), key=lambda e: e[1])
+
+        scopes: list[tuple[str, list[tuple[float, list[float], str]]]] = []
+        for scope, entries in similar.items():
+            uniq = {(ts, r): (ts, v, r) for ts, v, r in entries if now - ts <= self.ttl_s}
+            kept = sorted(uniq.values(), key=lambda e: e[0])[-self.max_per_scope:]
+            if kept:
+                scopes.append((scope, kept))
+        scopes.sort(key=lambda se: se[1][-1][0])
+        return kept_exact[-self.max_entries:], scopes[-self.max_entries:]
+
+    @staticmethod
+    def _entries(
+        data: dict[str, Any],
+    ) -> tuple[list[tuple[str, float, str]], dict[str, list[tuple[float, list[float], str]]]]:
+        exact = [(k, ts, r) for k, ts, r in data.get("exact", [])]
+        similar = {s: [(ts, v, r) for ts, v, r in e] for s, e in data.get("similar", {}).items()}
+        return exact, similar
+
+    def _load(self) -> None:
+        exact, similar = self._fresh(*self._entries(self._read()))
+        for key, ts, response in exact:
+            self.exact._data[key] = (ts, response)
+        for scope, entries in similar:
+            self._similar[scope] = entries
+
+    def save(self) -> None:
+        """Fusionne avec le fichier (verrou inter-process) puis l'écrit de façon atomique."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            exact, similar = self._entries(self._read())
+            exact += [(k, ts, r) for k, (ts, r) in self.exact._data.items()]
+            for scope, entries in self._similar.items():
+                similar.setdefault(scope, []).extend(entries)
+            kept_exact, kept_similar = self._fresh(exact, similar)
+
+            data: dict[str, Any] = {
+                "exact": [[k, ts, r] for k, ts, r in kept_exact],
+                "similar": {s: [[ts, v, r] for ts, v, r in e] for s, e in kept_similar},
+            }
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
@@ -1,16 +1,65 @@
+import asyncio
 import httpx
 from typing import Any
 
+from backend.services.http import make_async_client
+
+# Taille max d'un lot côté MCP (PLACE_BATCH_MAX_URLS): au-delà, découpé en plusieurs requêtes
+PLACE_BATCH_MAX_URLS = 50
+
 class MCPClient:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", max_connections: int = 20, keepalive_expiry: float = 60.0):
         self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = make_async_client(
+                max_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def call_tool(self, tool_name: str, args: dict[str, Any], timeout_s: float = 30.0) -> dict[str, Any]:
         """
         Convention simple: POST /tools/{tool_name}
         Le dev MCP doit exposer ce contrat.
         """
-        async with httpx.AsyncClient(timeout=timeout_s) as client:
-            r = await client.post(f"{self.base_url}/tools/{tool_name}", json=args)
-            r.raise_for_status()
-            return r.json()
+        r = await self.client.post(f"{self.base_url}/tools/{tool_name}", json=args, timeout=timeout_s)
+        r.raise_for_status()
+        return r.json()
+
+    async def scrape_place_batch(self, urls: list[str], timeout_s: float = 60.0) -> dict[str, Any]:
+        """
+        POST /tools/scrape_place_batch: plusieurs lieux en un aller-retour.
+        Retour: {ok, results:[{ok, source_url, item, error}], error}, un résultat par URL
+        (dédupliquées, dans l'ordre), les lots de plus de PLACE_BATCH_MAX_URLS étant envoyés en parallèle.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {"ok": True, "results": [], "error": None}
+        chunks = [urls[i:i + PLACE_BATCH_MAX_URLS] for i in range(0, len(urls), PLACE_BATCH_MAX_URLS)]
+        payloads = await asyncio.gather(
+            *(self.call_tool("scrape_place_batch", {"urls": chunk}, timeout_s=timeout_s) for chunk in chunks),
+            return_exceptions=True,
+        )
+        results: list[dict[str, Any]] = []
+        errors: list[str] = []
+        for chunk, p in zip(chunks, payloads):
+            if isinstance(p, BaseException):
+                # lot en échec (HTTP, timeout): une erreur par URL, les autres lots restent exploitables
+                results.extend({"ok": False, "source_url": url, "item": None, "error": str(p)} for url in chunk)
+                errors.append(str(p))
+                continue
+            results.extend(p.get("results") or [])
+            if p.get("error"):
+                errors.append(str(p["error"]))
+        return {"ok": not errors, "results": results, "error": "; ".join(errors) or None}
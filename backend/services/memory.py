@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+Message = dict[str, str]
+
+MAX_MESSAGES = 12
+CONVERSATION_TTL_S = 24 * 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore(ABC):
+    """
+    Historique des conversations (clé = conversation_id).
+    get() renvoie [] pour une conversation inconnue ou expirée;
+    save() ne garde que les max_messages derniers messages.
+    aget()/asave() sont les versions appelées depuis la boucle asyncio.
+    """
+
+    def __init__(self, max_messages: int = MAX_MESSAGES, ttl_s: float = CONVERSATION_TTL_S):
+        self.max_messages = max_messages
+        self.ttl_s = ttl_s
+
+    @abstractmethod
+    def get(self, conversation_id: str) -> list[Message]:
+        ...
+
+    @abstractmethod
+    def save(self, conversation_id: str, history: list[Message]) -> None:
+        ...
+
+    async def aget(self, conversation_id: str) -> list[Message]:
+        return self.get(conversation_id)
+
+    async def asave(self, conversation_id: str, history: list[Message]) -> None:
+        self.save(conversation_id, history)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryConversationStore(ConversationStore):
+    """LRU en mémoire, borné en nombre de conversations, avec TTL (propre à un worker)."""
+
+    def __init__(
+        self,
+        max_conversations: int = 10000,
+        max_messages: int = MAX_MESSAGES,
+        ttl_s: float = CONVERSATION_TTL_S,
+    ):
+        super().__init__(max_messages, ttl_s)
+        self.max_conversations = max_conversations
+        self._data: "OrderedDict[str, tuple[float, list[Message]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, conversation_id: str) -> list[Message]:
+        entry = self._data.get(conversation_id)
+        if entry is None:
+            return []
+        if time.time() - entry[0] > self.ttl_s:
+            self._data.pop(conversation_id, None)
+            return []
+        self._data.move_to_end(conversation_id)
+        return list(entry[1])
+
+    def save(self, conversation_id: str, history: list[Message]) -> None:
+        self._data[conversation_id] = (time.time(), history[-self.max_messages:])
+        self._data.move_to_end(conversation_id)
+        while len(self._data) > self.max_conversations:
+            self._data.popitem(last=False)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Historique sur disque (SQLite en WAL), partagé entre workers et redémarrages.
+    Les conversations expirées sont purgées périodiquement.
+    """
+
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str, max_messages: int = MAX_MESSAGES, ttl_s: float = CONVERSATION_TTL_S):
+        super().__init__(max_messages, ttl_s)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id TEXT PRIMARY KEY, ts REAL NOT NULL, messages TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversations_ts ON conversations(ts)")
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, conversation_id: str) -> list[Message]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT ts, messages FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+        except sqlite3.Error:
+            return []
+        if not row or time.time() - row[0] > self.ttl_s:
+            return []
+        try:
+            return list(json.loads(row[1]))
+        except ValueError:
+            return []
+
+    def save(self, conversation_id: str, history: list[Message]) -> None:
+        payload = json.dumps(history[-self.max_messages:], ensure_ascii=False)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO conversations (id, ts, messages) VALUES (?, ?, ?)",
+                    (conversation_id, now, payload),
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM conversations WHERE ts < ?", (now - self.ttl_s,))
+                self._conn.commit()
+        except sqlite3.Error:
+            return
+
+    # SQLite (attente de verrou jusqu'à 5 s entre workers) hors de la boucle asyncio
+
+    async def aget(self, conversation_id: str) -> list[Message]:
+        return await asyncio.to_thread(self.get, conversation_id)
+
+    async def asave(self, conversation_id: str, history: list[Message]) -> None:
+        await asyncio.to_thread(self.save, conversation_id, history)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def make_conversation_store(db_path: Optional[str] = None) -> ConversationStore:
+    """SQLite si un chemin est fourni (multi-workers), sinon LRU en mémoire."""
+    if db_path:
+        try:
+            return SQLiteConversationStore(db_path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("historique SQLite indisponible (%s: %s), repli en mémoire par worker", db_path, e)
+    return MemoryConversationStore()
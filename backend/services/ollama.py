@@ -1,20 +1,112 @@
+import json
 import httpx
-from typing import Any
+from typing import Any, AsyncIterator
+
+from backend.services.http import make_async_client
+
+# Durée pendant laquelle Ollama garde le modèle (et son cache KV) chargé entre deux appels
+KEEP_ALIVE = "30m"
+
+ChatMessage = dict[str, str]
+
+
+def _record_stats(stats: dict[str, float] | None, data: dict[str, Any]) -> None:
+    """Cumule les compteurs renvoyés par Ollama (durées en ns -> ms)."""
+    if stats is None:
+        return
+    stats["calls"] = stats.get("calls", 0) + 1
+    stats["prompt_eval_count"] = stats.get("prompt_eval_count", 0) + int(data.get("prompt_eval_count") or 0)
+    stats["prompt_eval_ms"] = stats.get("prompt_eval_ms", 0) + round((data.get("prompt_eval_duration") or 0) / 1e6, 1)
+    stats["eval_count"] = stats.get("eval_count", 0) + int(data.get("eval_count") or 0)
+    stats["eval_ms"] = stats.get("eval_ms", 0) + round((data.get("eval_duration") or 0) / 1e6, 1)
+
 
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.1:8b"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama3.1:8b",
+        embed_model: str = "nomic-embed-text",
+        max_connections: int = 10,
+        keepalive_expiry: float = 120.0,
+    ):
         self.base_url = base_url.rstrip("/")
         self.model = model
+        self.embed_model = embed_model
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = make_async_client(
+                max_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-    async def generate(self, prompt: str, system: str = "", timeout_s: float = 120.0) -> str:
+    async def chat(
+        self,
+        messages: list[ChatMessage],
+        timeout_s: float = 120.0,
+        stats: dict[str, float] | None = None,
+    ) -> str:
+        """
+        /api/chat avec keep_alive. Ollama réutilise son cache KV pour le plus long
+        préfixe commun avec l'appel précédent (system prompt, historique, pass 1):
+        seuls les nouveaux tokens sont évalués. `stats` reçoit les compteurs prompt_eval/eval.
+        """
         payload: dict[str, Any] = {
             "model": self.model,
-            "prompt": prompt,
-            "system": system,
+            "messages": messages,
             "stream": False,
+            "keep_alive": KEEP_ALIVE,
         }
-        async with httpx.AsyncClient(timeout=timeout_s) as client:
-            r = await client.post(f"{self.base_url}/api/generate", json=payload)
+        r = await self.client.post(f"{self.base_url}/api/chat", json=payload, timeout=timeout_s)
+        r.raise_for_status()
+        data = r.json()
+        _record_stats(stats, data)
+        return ((data.get("message") or {}).get("content") or "").strip()
+
+    async def chat_stream(
+        self,
+        messages: list[ChatMessage],
+        timeout_s: float = 120.0,
+        stats: dict[str, float] | None = None,
+    ) -> AsyncIterator[str]:
+        """Même appel que chat() en streaming NDJSON (stats lues sur la ligne finale)."""
+        payload: dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        }
+        async with self.client.stream("POST", f"{self.base_url}/api/chat", json=payload, timeout=timeout_s) as r:
             r.raise_for_status()
-            data = r.json()
-        return (data.get("response") or "").strip()
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                chunk = (data.get("message") or {}).get("content") or ""
+                if chunk:
+                    yield chunk
+                if data.get("done"):
+                    _record_stats(stats, data)
+                    break
+
+    async def embed(self, texts: list[str], timeout_s: float = 60.0) -> list[list[float]]:
+        """Embeddings par lot via /api/embed (un vecteur par texte, même ordre)."""
+        payload: dict[str, Any] = {
+            "model": self.embed_model,
+            "input": texts,
+        }
+        r = await self.client.post(f"{self.base_url}/api/embed", json=payload, timeout=timeout_s)
+        r.raise_for_status()
+        data = r.json()
+        return data.get("embeddings") or []
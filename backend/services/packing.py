@@ -0,0 +1,100 @@
+import math
+from typing import Any
+
+# Résultat de tool dans le prompt de la pass 2: un item par ligne, champs utiles
+# seulement, textes tronqués, doublons retirés, et plafond global en tokens.
+
+TOOL_RESULT_TOKEN_BUDGET = 700
+MAX_FIELD_CHARS = 240
+# estimation grossière du tokenizer llama3 sur du français (~3.5 caractères / token)
+CHARS_PER_TOKEN = 3.5
+
+# Champs transmis au LLM, dans cet ordre (ok, error, source_url... sont ignorés)
+ITEM_FIELDS = (
+    "name", "title", "url", "type", "startDate", "endDate", "location",
+    "address", "opening_hours", "prices", "phone", "website",
+    "short_description", "info_pratique",
+)
+# Jamais tronqués: le LLM doit pouvoir les recopier tels quels
+VERBATIM_FIELDS = {"url", "website", "phone", "startDate", "endDate"}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _clean(v: Any) -> str:
+    if isinstance(v, (list, tuple)):
+        v = ", ".join(str(x) for x in v if x)
+    return " ".join(str(v).split())
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def _pack_item(it: dict[str, Any]) -> str:
+    parts: list[str] = []
+    seen: set[str] = set()
+    label = _clean(it.get("name") or it.get("title") or "")
+    for f in ITEM_FIELDS:
+        v = it.get(f)
+        if v is None or v == "" or v == []:
+            continue
+        text = _clean(v)
+        if f == "title" and it.get("name"):
+            continue
+        if f not in ("name", "title") and label and text.startswith(label):
+            # info_pratique reprend souvent le titre
+            text = text[len(label):].strip(" -–—:|,")
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        if f not in VERBATIM_FIELDS:
+            text = _truncate(text, MAX_FIELD_CHARS)
+        parts.append(f"{f}={text}")
+    return " | ".join(parts)
+
+
+def pack_tool_result(payload: Any, budget_tokens: int = TOOL_RESULT_TOKEN_BUDGET) -> str:
+    """Représentation compacte (commune à tous les tools) d'un résultat MCP pour le prompt."""
+    if not isinstance(payload, dict):
+        return _truncate(_clean(payload), int(budget_tokens * CHARS_PER_TOKEN))
+
+    items = payload.get("items")
+    if not isinstance(items, list):
+        items = [payload["item"]] if isinstance(payload.get("item"), dict) else []
+
+    lines: list[str] = []
+    if payload.get("error"):
+        lines.append(f"erreur={_truncate(_clean(payload['error']), MAX_FIELD_CHARS)}")
+
+    unique: list[dict[str, Any]] = []
+    seen_keys: set[str] = set()
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        key = str(it.get("url") or it.get("name") or it.get("title") or "")
+        if key and key in seen_keys:
+            continue
+        seen_keys.add(key)
+        unique.append(it)
+
+    used = sum(estimate_tokens(line) for line in lines)
+    packed = 0
+    for it in unique:
+        line = f"- {_pack_item(it)}"
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            if packed == 0:
+                # au moins un item, tronqué au budget restant
+                lines.append(_truncate(line, max(int((budget_tokens - used) * CHARS_PER_TOKEN), 80)))
+                packed = 1
+            break
+        lines.append(line)
+        used += cost
+        packed += 1
+
+    if packed < len(unique):
+        lines.append(f"({len(unique) - packed} autres items omis)")
+    return "\n".join(lines) if lines else "aucun résultat"
@@ -0,0 +1,84 @@
+import sys
+from typing import Any, Optional
+
+# Champs connus d'un lieu (ordre de kb.json); les autres clés vont dans `extras`
+PLACE_FIELDS = ("id", "name", "type", "district", "themes", "short_description", "url", "image_url")
+
+
+class _Missing:
+    """Clé absente de l'entrée d'origine (différent d'une valeur null)."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __bool__(self) -> bool:
+        return False
+
+
+MISSING: Any = _Missing()
+
+
+def _intern(v: Any) -> Any:
+    return sys.intern(v) if isinstance(v, str) else v
+
+
+class Place:
+    """
+    Lieu de la KB: record à slots (pas de dict par lieu).
+    type/district/themes sont internés (peu de valeurs distinctes, partagées).
+    Le dict n'est reconstruit qu'au moment de la réponse (to_dict).
+    """
+
+    __slots__ = PLACE_FIELDS + ("extras",)
+
+    def __init__(
+        self,
+        id: Any = MISSING,
+        name: Any = MISSING,
+        type: Any = MISSING,
+        district: Any = MISSING,
+        themes: Any = MISSING,
+        short_description: Any = MISSING,
+        url: Any = MISSING,
+        image_url: Any = MISSING,
+        extras: Optional[dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.type = _intern(type)
+        self.district = _intern(district)
+        if isinstance(themes, list):
+            themes = tuple(_intern(t) for t in themes)
+        self.themes = themes
+        self.short_description = short_description
+        self.url = url
+        self.image_url = image_url
+        self.extras = extras or None
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "Place":
+        extras = {k: v for k, v in d.items() if k not in PLACE_FIELDS}
+        return cls(**{f: d.get(f, MISSING) for f in PLACE_FIELDS}, extras=extras)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Lecture façon dict (index, embeddings), sans construire de dict."""
+        if key in PLACE_FIELDS:
+            v = getattr(self, key)
+            return default if v is MISSING else v
+        return self.extras.get(key, default) if self.extras else default
+
+    def to_dict(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for f in PLACE_FIELDS:
+            v = getattr(self, f)
+            if v is MISSING:
+                continue
+            out[f] = list(v) if f == "themes" and isinstance(v, tuple) else v
+        if self.extras:
+            out.update(self.extras)
+        return out
+
+    def __repr__(self) -> str:
+        return f"Place(id={self.id!r}, name={self.name!r})"
@@ -0,0 +1,216 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy absent: repli en pur Python (mêmes scores, plus lent)
+    np = None
+
+
+# Champs indexés et leur poids (BM25F)
+FIELD_WEIGHTS: dict[str, float] = {
+    "name": 3.0,
+    "themes": 2.0,
+    "short_description": 1.0,
+    "district": 1.0,
+}
+
+
+class Ranker(ABC):
+    """
+    Moteur de score lexical de la KB.
+
+    Construit une fois à partir des champs tokenisés de chaque lieu
+    (docs[i] = {"name": [...], "themes": [...], ...}).
+    score(groups) reçoit, pour chaque token de la requête, la liste des mots
+    du vocabulaire qui le contiennent, et renvoie un score par lieu.
+    """
+
+    name = "base"
+
+    def __init__(self, docs: list[dict[str, list[str]]]):
+        self.n_docs = len(docs)
+
+    @abstractmethod
+    def score(self, groups: list[list[str]]) -> list[float]:
+        ...
+
+
+class CountRanker(Ranker):
+    """Score historique: +1 par token de la requête présent dans le lieu."""
+
+    name = "count"
+
+    def __init__(self, docs: list[dict[str, list[str]]]):
+        super().__init__(docs)
+        self._postings: Any = {}
+        for i, fields in enumerate(docs):
+            for words in fields.values():
+                for w in words:
+                    self._postings.setdefault(w, set()).add(i)
+
+    @classmethod
+    def from_postings(cls, n_docs: int, postings: Any) -> "CountRanker":
+        """Réutilise l'index inversé de la KB (mot -> ids) au lieu de le reconstruire."""
+        self = cls.__new__(cls)
+        self.n_docs = n_docs
+        self._postings = postings
+        return self
+
+    def score(self, groups: list[list[str]]) -> list[float]:
+        scores = [0.0] * self.n_docs
+        for words in groups:
+            hits: set[int] = set()
+            for w in words:
+                hits.update(self._postings.get(w, ()))
+            for i in hits:
+                scores[i] += 1.0
+        return scores
+
+
+class BM25Ranker(Ranker):
+    """
+    BM25F sur name/themes/short_description/district.
+
+    La matrice terme x lieu est précalculée au format CSR (term_ptr, doc_idx, tfn)
+    où tfn est la fréquence déjà pondérée par champ et normalisée par longueur.
+    Une requête est scorée pour tous les lieux en une passe vectorisée (bincount).
+    """
+
+    name = "bm25"
+
+    def __init__(
+        self,
+        docs: list[dict[str, list[str]]],
+        field_weights: Optional[dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        super().__init__(docs)
+        self.k1 = k1
+        self.b = b
+        weights = field_weights or FIELD_WEIGHTS
+
+        avg_len: dict[str, float] = {}
+        for f in weights:
+            total = sum(len(d.get(f, [])) for d in docs)
+            avg_len[f] = (total / len(docs)) if docs and total else 1.0
+
+        # terme -> {doc: tf pondéré normalisé}
+        acc: dict[str, dict[int, float]] = {}
+        for i, fields in enumerate(docs):
+            for f, w_f in weights.items():
+                words = fields.get(f, [])
+                if not words:
+                    continue
+                norm_len = 1.0 - b + b * (len(words) / avg_len[f])
+                inc = w_f / norm_len
+                for w in words:
+                    row = acc.setdefault(w, {})
+                    row[i] = row.get(i, 0.0) + inc
+
+        self.term_ids: dict[str, int] = {}
+        ptr = [0]
+        doc_idx: list[int] = []
+        tfn: list[float] = []
+        for t, row in acc.items():
+            self.term_ids[t] = len(self.term_ids)
+            for i in sorted(row):
+                doc_idx.append(i)
+                tfn.append(row[i])
+            ptr.append(len(doc_idx))
+
+        if np is not None:
+            self._ptr: Any = np.asarray(ptr, dtype=np.int64)
+            self._doc_idx: Any = np.asarray(doc_idx, dtype=np.int32)
+            self._tfn: Any = np.asarray(tfn, dtype=np.float32)
+        else:
+            self._ptr, self._doc_idx, self._tfn = ptr, doc_idx, tfn
+
+    @classmethod
+    def from_arrays(
+        cls,
+        n_docs: int,
+        terms: list[str],
+        ptr: Any,
+        doc_idx: Any,
+        tfn: Any,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> "BM25Ranker":
+        """Ranker sur une matrice CSR déjà calculée (artefact KB mappé en mémoire)."""
+        self = cls.__new__(cls)
+        self.n_docs = n_docs
+        self.k1 = k1
+        self.b = b
+        self.term_ids = {t: j for j, t in enumerate(terms)}
+        self._ptr, self._doc_idx, self._tfn = ptr, doc_idx, tfn
+        return self
+
+    def terms(self) -> list[str]:
+        return list(self.term_ids)
+
+    def _idf(self, df: Any) -> Any:
+        n = self.n_docs
+        if np is not None:
+            return np.log1p((n - df + 0.5) / (df + 0.5))
+        return math.log1p((n - df + 0.5) / (df + 0.5))
+
+    def score(self, groups: list[list[str]]) -> Any:
+        n = self.n_docs
+        k1 = self.k1
+        groups_tids = [[self.term_ids[w] for w in words if w in self.term_ids] for words in groups]
+
+        if np is None:
+            return self._score_py(groups_tids)
+
+        # postings de tous les groupes concaténés, tagués par groupe
+        slices = []
+        gids = []
+        for g, tids in enumerate(groups_tids):
+            for t in tids:
+                a, z = self._ptr[t], self._ptr[t + 1]
+                slices.append(np.arange(a, z))
+                gids.append(np.full(z - a, g, dtype=np.int64))
+        if not slices:
+            return np.zeros(n, dtype=np.float32)
+
+        pos = np.concatenate(slices)
+        flat = np.concatenate(gids) * n + self._doc_idx[pos]
+        tf = np.bincount(flat, weights=self._tfn[pos], minlength=len(groups_tids) * n)
+        tf = tf.reshape(len(groups_tids), n)
+
+        df = np.count_nonzero(tf, axis=1)
+        idf = self._idf(df)
+        sat = tf * (k1 + 1.0) / (tf + k1)
+        return (idf[:, None] * sat).sum(axis=0)
+
+    def _score_py(self, groups_tids: list[list[int]]) -> list[float]:
+        k1 = self.k1
+        scores = [0.0] * self.n_docs
+        for tids in groups_tids:
+            tf: dict[int, float] = {}
+            for t in tids:
+                for k in range(self._ptr[t], self._ptr[t + 1]):
+                    i = self._doc_idx[k]
+                    tf[i] = tf.get(i, 0.0) + self._tfn[k]
+            if not tf:
+                continue
+            idf = self._idf(len(tf))
+            for i, v in tf.items():
+                scores[i] += idf * v * (k1 + 1.0) / (v + k1)
+        return scores
+
+
+RANKERS: dict[str, type[Ranker]] = {
+    "bm25": BM25Ranker,
+    "count": CountRanker,
+}
+
+
+def make_ranker(name: str, docs: list[dict[str, list[str]]]) -> Ranker:
+    cls = RANKERS.get(name)
+    if cls is None:
+        raise ValueError(f"Ranker inconnu: {name} (disponibles: {', '.join(RANKERS)})")
+    return cls(docs)
@@ -0,0 +1,116 @@
+from typing import Any, NamedTuple, Optional
+
+from backend.services.keywords import TYPE_KEYWORDS, infer_type, keyword_categories
+
+# Au-dessus de ce seuil, le tool est appelé directement (pas de LLM pass 1)
+ROUTER_MIN_CONFIDENCE = 0.8
+# Entre les deux, le tool est lancé en spéculatif pendant la pass 1 (annulé si le LLM ne le choisit pas)
+PREFETCH_MIN_CONFIDENCE = 0.5
+
+# Requête scrape_category par type de lieu
+CATEGORY_QUERIES = {
+    "restaurant": "restaurants",
+    "museum": "musées",
+    "park": "parcs et jardins",
+    "heritage": "patrimoine",
+}
+
+# Mots sans effet sur une recherche scrape_category (ville, liaisons)
+_QUERY_FILLER = {"lyon", "à", "a", "au", "aux", "de", "des", "du", "en", "la", "le", "les", "idées", "idees"}
+
+
+class Route(NamedTuple):
+    tool: Optional[str]            # None: la décision revient au LLM
+    args: dict[str, Any]
+    confidence: float
+    reason: str
+
+    def step(self) -> str:
+        return f"router:{self.tool or 'llm'}:{self.confidence:.2f}:{self.reason}"
+
+
+_LLM = Route(None, {}, 0.0, "no_rule")
+
+
+def _norm_name(s: Any) -> str:
+    return " ".join(str(s or "").lower().split())
+
+
+def route_intent(text: str, kb_items: list[dict[str, Any]]) -> Route:
+    """
+    Routage déterministe (mots-clés + résultats KB) pour les cas évidents.
+    `text` est le message normalisé. Renvoie toujours une Route; l'appelant ne
+    court-circuite le LLM que si confidence >= ROUTER_MIN_CONFIDENCE.
+    """
+    cats = keyword_categories(text)
+
+    # demande composée ("musées dans le 5e et événements ce week-end"): le LLM planifie
+    # plusieurs tools, les événements sont seulement lancés en spéculatif
+    if "events" in cats and infer_type(text):
+        return Route("scrape_events", {"limit": 20}, 0.6, "events_and_places")
+
+    # événements: "concerts ce week-end", "agenda de demain"
+    if "events" in cats:
+        return Route("scrape_events", {"limit": 20}, 0.95 if "when" in cats else 0.9, "events")
+
+    # infos pratiques sur un lieu de la KB cité par son nom
+    if "place_info" in cats:
+        for it in kb_items:
+            name = _norm_name(it.get("name"))
+            if name and it.get("url") and name in text:
+                return Route("scrape_place", {"url": it["url"]}, 0.9, "kb_place_named")
+        if kb_items and kb_items[0].get("url"):
+            return Route("scrape_place", {"url": kb_items[0]["url"]}, 0.6, "kb_top_place")
+
+    # "que faire ce week-end": événements ou idées de lieux, ambigu
+    if "when" in cats and "discover" in cats:
+        return Route("scrape_events", {"limit": 20}, 0.6, "when_discover")
+
+    # idées de lieux d'un type connu, sans résultat dans la KB
+    want_type = infer_type(text)
+    if want_type and not kb_items:
+        conf = 0.85 if "discover" in cats else 0.7
+        return Route("scrape_category", {"query": CATEGORY_QUERIES[want_type], "limit": 8}, conf, f"type:{want_type}")
+
+    return _LLM
+
+
+def _limit(args: dict[str, Any]) -> Optional[int]:
+    v = args.get("limit")
+    return v if isinstance(v, int) and not isinstance(v, bool) else None
+
+
+def _is_generic_query(query: str, place_type: str) -> bool:
+    """Requête réduite au type de lieu ("musées à Lyon"): même résultat que CATEGORY_QUERIES."""
+    vocab = set(CATEGORY_QUERIES[place_type].split())
+    for kw in TYPE_KEYWORDS[place_type]:
+        vocab.update(kw.split())
+    return all(w in _QUERY_FILLER or w in vocab or w.rstrip("s") in vocab for w in query.split())
+
+
+def prefetch_covers(prefetched: tuple[str, dict[str, Any]], tool: str, args: dict[str, Any]) -> bool:
+    """
+    Le résultat du prefetch (tool, args du routeur) répond-il à l'appel choisi par le LLM ?
+    Même tool, limite au moins égale (l'appelant tronque les items) et mêmes autres
+    arguments; pour scrape_category, une requête générique du même type suffit.
+    """
+    p_tool, p_args = prefetched
+    if p_tool != tool:
+        return False
+    if "limit" in p_args or "limit" in args:
+        p_limit, limit = _limit(p_args), _limit(args)
+        if p_limit is None or limit is None or p_limit < limit:
+            return False
+    p_rest = {k: v for k, v in p_args.items() if k != "limit"}
+    rest = {k: v for k, v in args.items() if k != "limit"}
+    if p_rest == rest:
+        return True
+    if tool == "scrape_category" and set(rest) == {"query"}:
+        query = _norm_name(rest["query"])
+        place_type = infer_type(query)
+        return (
+            place_type is not None
+            and p_rest == {"query": CATEGORY_QUERIES[place_type]}
+            and _is_generic_query(query, place_type)
+        )
+    return False
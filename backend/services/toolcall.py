@@ -1,21 +1,14 @@
 import json
 from typing import Any, Optional, TypedDict
 
+# Nombre max de tool-calls exécutés pour un même message
+MAX_TOOL_CALLS = 4
+
 class ToolCall(TypedDict):
     tool: str
     args: dict[str, Any]
 
-def parse_tool_call_loose(text: str) -> Optional[ToolCall]:
-    s = text.strip()
-    i = s.find("{")
-    j = s.rfind("}")
-    if i == -1 or j == -1 or j <= i:
-        return None
-    candidate = s[i:j+1]
-    try:
-        obj = json.loads(candidate)
-    except json.JSONDecodeError:
-        return None
+def _as_tool_call(obj: Any) -> Optional[ToolCall]:
     if not isinstance(obj, dict):
         return None
     if not isinstance(obj.get("tool"), str):
@@ -23,3 +16,41 @@ def parse_tool_call_loose(text: str) -> Optional[ToolCall]:
     if not isinstance(obj.get("args"), dict):
         return None
     return {"tool": obj["tool"], "args": obj["args"]}
+
+def _loads_between(s: str, start: str, end: str) -> Any:
+    i = s.find(start)
+    j = s.rfind(end)
+    if i == -1 or j == -1 or j <= i:
+        return None
+    try:
+        return json.loads(s[i:j+1])
+    except json.JSONDecodeError:
+        return None
+
+def parse_tool_calls_loose(text: str) -> list[ToolCall]:
+    """
+    Tool-calls contenus dans la sortie LLM: un objet JSON, ou une liste d'objets
+    pour un plan multi-tools. Entrées invalides ignorées, doublons retirés.
+    """
+    s = text.strip()
+    i, k = s.find("{"), s.find("[")
+    obj = _loads_between(s, "[", "]") if k != -1 and (i == -1 or k < i) else None
+    if not isinstance(obj, list):
+        obj = [_loads_between(s, "{", "}")]
+
+    calls: list[ToolCall] = []
+    seen: set[str] = set()
+    for o in obj:
+        call = _as_tool_call(o)
+        if call is None:
+            continue
+        key = json.dumps(call, sort_keys=True, ensure_ascii=False)
+        if key in seen:
+            continue
+        seen.add(key)
+        calls.append(call)
+    return calls[:MAX_TOOL_CALLS]
+
+def parse_tool_call_loose(text: str) -> Optional[ToolCall]:
+    calls = parse_tool_calls_loose(text)
+    return calls[0] if calls else None
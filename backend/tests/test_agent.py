@@ -0,0 +1,143 @@
+# Agent avec Ollama et le serveur MCP remplacés par des doublures (pas de réseau).
+import asyncio
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from backend.services import agent as agent_mod
+from backend.services.agent import Agent
+
+PLACE_URL = "https://www.visiterlyon.com/lieux-a-visiter/musee-des-confluences"
+PLACE_ITEM = {
+    "url": PLACE_URL,
+    "name": "Musée des Confluences",
+    "address": "86 quai Perrache, 69002 Lyon",
+    "phone": "04 28 38 12 12",
+    "openingHours": [f"Jour {i}: 10h30 - 18h30, nocturne le jeudi jusqu'à 22h" for i in range(7)],
+    "description": "Musée de sciences et de sociétés au confluent du Rhône et de la Saône. " * 40,
+}
+
+
+class FakeOllama:
+    """Réponses scriptées par pass: la pass 1 renvoie `pass1`, la pass 2 `answer`."""
+
+    def __init__(self, pass1: str, answer: str = "Réponse finale."):
+        self.pass1 = pass1
+        self.answer = answer
+        self.calls: list[list[dict[str, str]]] = []
+
+    def _reply(self, messages):
+        self.calls.append(messages)
+        return self.answer if "Résultat du tool" in messages[-1]["content"] else self.pass1
+
+    async def chat(self, messages, timeout_s=120.0, stats=None):
+        return self._reply(messages)
+
+    async def chat_stream(self, messages, timeout_s=120.0, stats=None):
+        out = self._reply(messages)
+        for i in range(0, len(out), 4):
+            yield out[i:i + 4]
+
+
+def stub(a: Agent) -> Agent:
+    """Remplace Ollama (FakeOllama, dans a.fake) et les tools MCP (appels notés dans a.tool_calls)."""
+    a.fake = FakeOllama(pass1=json.dumps({"tool": "scrape_place", "args": {"url": PLACE_URL}}))
+    a.ollama.chat = a.fake.chat
+    a.ollama.chat_stream = a.fake.chat_stream
+    a.tool_calls = []
+
+    async def call_tool(tool, args, **kw):
+        a.tool_calls.append((tool, args))
+        if tool == "scrape_place":
+            return {"ok": True, "item": PLACE_ITEM}
+        if tool == "scrape_events":
+            saturday = date.today() + timedelta(days=(5 - date.today().weekday()) % 7)
+            items = [
+                {"title": f"Concert {i}", "url": f"https://x/e{i}", "startDate": saturday.isoformat()}
+                for i in range(args["limit"])
+            ]
+            return {"ok": True, "items": items}
+        return {"ok": True, "items": [{"name": "Lieu", "url": "https://x/l"}]}
+
+    a.mcp.call_tool = call_tool
+    return a
+
+
+@pytest.fixture
+def agent():
+    return stub(Agent())
+
+
+def test_history_keeps_recent_tool_turns(agent):
+    messages = [
+        "horaires du musée des confluences",
+        "et le tarif du musée des confluences ?",
+        "accès au musée des confluences en tram ?",
+    ]
+    for i, msg in enumerate(messages):
+        r = asyncio.run(agent.run("c", msg))
+        assert r["trace"]["tool_called"] == "scrape_place"
+        history = agent.memory.get("c")
+        # le tour courant est gardé complet (préfixe réutilisable au tour suivant)
+        assert history[-1] == {"role": "assistant", "content": "Réponse finale."}
+        # routage direct (lieu nommé de la KB): tour = bloc KB + résultat du tool, réponse
+        assert history[-2]["message"] == msg
+        assert agent_mod.estimate_tokens(history[-2]["content"]) > agent_mod.HISTORY_MAX_TOKENS // 2
+        # les tours précédents sont compactés, aucun n'est perdu ici
+        assert [m["content"] for m in history[:-2]] == [
+            c for prev in messages[:i] for c in (prev, "Réponse finale.")
+        ]
+
+
+def test_history_prefix_is_reused(agent):
+    asyncio.run(agent.run("c", "horaires du musée des confluences"))
+    last_call = agent.fake.calls[-1]
+    asyncio.run(agent.run("c", "et le tarif du musée des confluences ?"))
+    first_call = agent.fake.calls[-1]
+    # appel du second tour = appel du premier + réponse + nouveau message
+    assert first_call[:len(last_call)] == last_call
+    assert first_call[len(last_call)] == {"role": "assistant", "content": "Réponse finale."}
+
+
+def test_events_prefetch_is_reused(agent):
+    # route when_discover (0.6): scrape_events lancé pendant la pass 1, avec limit 20
+    agent.fake.pass1 = json.dumps({"tool": "scrape_events", "args": {"limit": 5}})
+    r = asyncio.run(agent.run("c", "que faire ce week-end à lyon ?"))
+    steps = r["trace"]["steps"]
+    assert "tool_prefetch:scrape_events" in steps
+    assert "tool_prefetch_hit" in steps and "tool_prefetch_cancelled" not in steps
+    assert agent.tool_calls == [("scrape_events", {"limit": 20})]
+    # items tronqués à la limite demandée par le LLM
+    assert r["answer"].count("\n* ") == 5
+
+
+def test_prefetch_cancelled_for_other_tool(agent):
+    agent.fake.pass1 = json.dumps({"tool": "scrape_category", "args": {"query": "bars à cocktails", "limit": 5}})
+    r = asyncio.run(agent.run("c", "que faire ce week-end à lyon ?"))
+    assert "tool_prefetch_cancelled" in r["trace"]["steps"]
+    assert agent.tool_calls[-1] == ("scrape_category", {"query": "bars à cocktails", "limit": 5})
+
+
+def _run_streaming(agent, msg):
+    events = []
+
+    async def emit(event):
+        events.append(event)
+
+    r = asyncio.run(agent.run("c", msg, emit=emit))
+    return r, "".join(e["text"] for e in events if e["event"] == "token")
+
+
+def test_pass1_answer_is_streamed(agent):
+    # KB sans besoin de données live -> la pass 1 répond sans tool
+    agent.fake.pass1 = "  Le musée ouvre à 10h30."
+    r, streamed = _run_streaming(agent, "horaires d'un musée gratuit à lyon")
+    assert "final_from_pass1" in r["trace"]["steps"]
+    assert streamed.strip() == r["answer"] == "Le musée ouvre à 10h30."
+
+
+def test_pass1_tool_call_is_not_streamed(agent):
+    r, streamed = _run_streaming(agent, "horaires d'un musée gratuit à lyon")
+    assert "llm_pass2" in r["trace"]["steps"]
+    assert streamed == "Réponse finale."
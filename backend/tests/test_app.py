@@ -0,0 +1,17 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from backend import app as app_mod
+from backend.tests.test_agent import stub
+
+
+def test_chat_stream_sends_pass1_tokens():
+    with TestClient(app_mod.app) as client:
+        stub(app_mod.agent).fake.pass1 = "Le musée ouvre à 10h30."
+        resp = client.post("/chat/stream", json={"conversation_id": "t", "message": "horaires d'un musée gratuit à lyon"})
+        events = [json.loads(line) for line in resp.text.splitlines()]
+    tokens = [e["text"] for e in events if e["event"] == "token"]
+    assert len(tokens) > 1
+    assert events[-1]["event"] == "done"
+    assert "".join(tokens) == events[-1]["answer"]
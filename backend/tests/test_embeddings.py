@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.services.embeddings import VectorIndex
+
+PLACES = [{"id": f"p{i}", "name": f"Lieu {i}", "type": "museum"} for i in range(40)]
+
+
+def _embedder(calls: list[str]):
+    async def embed(texts):
+        calls.extend(texts)
+        await asyncio.sleep(0.01)  # laisse l'autre worker attendre le verrou
+        return [[float(len(t)), float(i + 1), 1.0] for i, t in enumerate(texts)]
+    return embed
+
+
+def test_sync_reembeds_only_changed_places(tmp_path):
+    calls: list[str] = []
+    index = VectorIndex(str(tmp_path))
+    assert asyncio.run(index.sync(PLACES, _embedder(calls), "m")) == len(PLACES)
+
+    changed = [dict(p) for p in PLACES]
+    changed[3]["name"] = "Autre lieu"
+    reopened = VectorIndex(str(tmp_path))
+    assert asyncio.run(reopened.sync(changed, _embedder(calls), "m")) == 1
+    assert len(calls) == len(PLACES) + 1
+    assert reopened.matrix.shape == (len(PLACES), 3)
+    # une seule matrice sur disque, celle référencée par ids.json
+    meta = json.loads((tmp_path / "ids.json").read_text(encoding="utf-8"))
+    assert [p.name for p in tmp_path.glob("vectors*.f32")] == [meta["vectors"]]
+
+
+def test_concurrent_sync_embeds_once(tmp_path):
+    calls: list[str] = []
+
+    async def two_workers():
+        a, b = VectorIndex(str(tmp_path)), VectorIndex(str(tmp_path))
+        return await asyncio.gather(a.sync(PLACES, _embedder(calls), "m"), b.sync(PLACES, _embedder(calls), "m"))
+
+    assert sorted(asyncio.run(two_workers())) == [0, len(PLACES)]
+    assert len(calls) == len(PLACES)
+    assert not list(tmp_path.glob("*.tmp"))
+    assert len(VectorIndex(str(tmp_path))) == len(PLACES)
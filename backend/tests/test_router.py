@@ -0,0 +1,25 @@
+import pytest
+
+from backend.services.router import prefetch_covers
+
+EVENTS = ("scrape_events", {"limit": 20})
+MUSEUMS = ("scrape_category", {"query": "musées", "limit": 8})
+PLACE = ("scrape_place", {"url": "https://www.visiterlyon.com/x"})
+
+
+@pytest.mark.parametrize("prefetched, tool, args, expected", [
+    (EVENTS, "scrape_events", {"limit": 5}, True),
+    (EVENTS, "scrape_events", {"limit": 20}, True),
+    (EVENTS, "scrape_events", {"limit": 30}, False),
+    (EVENTS, "scrape_events", {"limit": "5"}, False),
+    (EVENTS, "scrape_category", {"query": "musées", "limit": 5}, False),
+    (MUSEUMS, "scrape_category", {"query": "musées", "limit": 5}, True),
+    (MUSEUMS, "scrape_category", {"query": "Musées à Lyon", "limit": 5}, True),
+    (MUSEUMS, "scrape_category", {"query": "musée", "limit": 8}, True),
+    (MUSEUMS, "scrape_category", {"query": "musées gratuits", "limit": 5}, False),
+    (MUSEUMS, "scrape_category", {"query": "restaurants", "limit": 5}, False),
+    (PLACE, "scrape_place", {"url": "https://www.visiterlyon.com/x"}, True),
+    (PLACE, "scrape_place", {"url": "https://www.visiterlyon.com/y"}, False),
+])
+def test_prefetch_covers(prefetched, tool, args, expected):
+    assert prefetch_covers(prefetched, tool, args) is expected
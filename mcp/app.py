@@ -1,10 +1,19 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from pydantic import BaseModel, HttpUrl, Field
 
-from mcp.tools import scrape_category, scrape_place, scrape_events
+from mcp import tools
+from mcp.tools import PLACE_BATCH_MAX_URLS, scrape_category, scrape_place, scrape_place_batch, scrape_events
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await tools.aclose()
 
 
-app = FastAPI(title="MCP Tools", version="0.1.0")
+app = FastAPI(title="MCP Tools", version="0.1.0", lifespan=lifespan)
 
 class CategoryArgs(BaseModel):
     query: str
@@ -13,6 +22,10 @@ class CategoryArgs(BaseModel):
 class PlaceArgs(BaseModel):
     url: HttpUrl
 
+class PlaceBatchArgs(BaseModel):
+    # str et non HttpUrl: une URL invalide donne une erreur pour elle seule, pas un 422 global
+    urls: list[str] = Field(min_length=1, max_length=PLACE_BATCH_MAX_URLS)
+
 class EventsArgs(BaseModel):
     limit: int = Field(default=10, ge=1, le=20)
 
@@ -21,13 +34,17 @@ def health():
     return {"status": "ok"}
 
 @app.post("/tools/scrape_category")
-def tool_category(args: CategoryArgs):
-    return scrape_category(args.query, limit=args.limit)
+async def tool_category(args: CategoryArgs):
+    return await scrape_category(args.query, limit=args.limit)
 
 @app.post("/tools/scrape_place")
-def tool_place(args: PlaceArgs):
-    return scrape_place(str(args.url))
+async def tool_place(args: PlaceArgs):
+    return await scrape_place(str(args.url))
+
+@app.post("/tools/scrape_place_batch")
+async def tool_place_batch(args: PlaceBatchArgs):
+    return await scrape_place_batch(args.urls)
 
 @app.post("/tools/scrape_events")
-def tool_events(args: EventsArgs):
-    return scrape_events(limit=args.limit)
+async def tool_events(args: EventsArgs):
+    return await scrape_events(limit=args.limit)
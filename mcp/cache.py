@@ -0,0 +1,239 @@
+# mcp/cache.py
+import asyncio
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CachedPage(NamedTuple):
+    ts: float                      # date du dernier fetch/revalidation réussi
+    body: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stamp: str = ""                # empreinte du body (voir make_page), calculée une fois
+
+
+def make_page(ts: float, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CachedPage:
+    """CachedPage avec son empreinte, calculée au fetch (et non à chaque lookup)."""
+    return CachedPage(ts, body, etag, last_modified, f"{len(body)}:{zlib.crc32(body.encode('utf-8')):08x}")
+
+
+class PageCache(ABC):
+    """Interface du cache de pages (clé = URL)."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedPage]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, page: CachedPage) -> None:
+        ...
+
+
+class MemoryPageCache(PageCache):
+    """LRU en mémoire borné en nombre d'entrées et en taille totale (caractères)."""
+
+    def __init__(self, max_entries: int = 512, max_chars: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._data: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._data.get(key)
+            if page is not None:
+                self._data.move_to_end(key)
+            return page
+
+    def set(self, key: str, page: CachedPage) -> None:
+        if len(page.body) > self.max_chars:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._chars -= len(old.body)
+            self._data[key] = page
+            self._chars += len(page.body)
+            while len(self._data) > self.max_entries or self._chars > self.max_chars:
+                _, evicted = self._data.popitem(last=False)
+                self._chars -= len(evicted.body)
+
+
+class SQLitePageCache(PageCache):
+    """
+    Cache disque partagé entre workers/redémarrages (SQLite en WAL, HTML compressé zlib).
+    Borné à max_entries: les entrées les plus anciennes sont purgées.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, ts REAL NOT NULL, body BLOB NOT NULL,"
+            " etag TEXT, last_modified TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_ts ON pages(ts)")
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT ts, body, etag, last_modified FROM pages WHERE url = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row:
+            return None
+        ts, body, etag, last_modified = row
+        return make_page(ts, zlib.decompress(body).decode("utf-8"), etag, last_modified)
+
+    def set(self, key: str, page: CachedPage) -> None:
+        blob = zlib.compress(page.body.encode("utf-8"), 6)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, ts, body, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                    (key, page.ts, blob, page.etag, page.last_modified),
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._conn.execute(
+                        "DELETE FROM pages WHERE url NOT IN (SELECT url FROM pages ORDER BY ts DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+                self._conn.commit()
+        except sqlite3.Error:
+            return
+
+
+class TieredPageCache(PageCache):
+    """Mémoire (LRU) devant un cache disque optionnel."""
+
+    def __init__(self, memory: MemoryPageCache, disk: Optional[PageCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        page = self.memory.get(key)
+        if page is None and self.disk is not None:
+            page = self.disk.get(key)
+            if page is not None:
+                self.memory.set(key, page)
+        return page
+
+    def set(self, key: str, page: CachedPage) -> None:
+        self.memory.set(key, page)
+        if self.disk is not None:
+            self.disk.set(key, page)
+
+    # Versions pour la boucle asyncio: la mémoire reste sur la boucle, le tier disque
+    # (SQLite, attente de verrou, zlib) passe par un thread pour ne pas la bloquer.
+
+    async def aget(self, key: str) -> Optional[CachedPage]:
+        page = self.memory.get(key)
+        if page is None and self.disk is not None:
+            page = await asyncio.to_thread(self.disk.get, key)
+            if page is not None:
+                self.memory.set(key, page)
+        return page
+
+    async def aset(self, key: str, page: CachedPage) -> None:
+        self.memory.set(key, page)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, page)
+
+
+class LRUCache:
+    """Petit LRU générique thread-safe (résultats d'extraction, etc.)."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            val = self._data.get(key)
+            if val is not None:
+                self._data.move_to_end(key)
+            return val
+
+    def set(self, key: Hashable, val: Any) -> None:
+        with self._lock:
+            self._data[key] = val
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class AsyncSingleFlight:
+    """
+    Coalescence des appels concurrents identiques: pour une même clé, une seule
+    coroutine fn() est en cours; les autres appelants attendent et reçoivent son résultat.
+    Si l'appelant qui exécute fn() est annulé, les autres ne le sont pas: l'un d'eux
+    relance fn().
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while (fut := self._calls.get(key)) is not None:
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not fut.cancelled() or (task is not None and task.cancelling()):
+                    raise  # c'est bien nous qui sommes annulés
+                # le leader a été annulé: on reprend (en devenant leader si personne ne l'a fait)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._calls[key] = fut
+        try:
+            res = await fn()
+            fut.set_result(res)
+            return res
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # marque l'exception comme récupérée s'il n'y a aucun suiveur
+            raise
+        finally:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+
+def make_page_cache(disk_path: Optional[str], max_entries: int = 512) -> TieredPageCache:
+    disk: Optional[PageCache] = None
+    if disk_path:
+        try:
+            disk = SQLitePageCache(disk_path)
+        except (OSError, sqlite3.Error):
+            disk = None
+    return TieredPageCache(MemoryPageCache(max_entries=max_entries), disk)
+
+
+def is_fresh(page: CachedPage, ttl_s: float) -> bool:
+    return time.time() - page.ts <= ttl_s
+
+
+def page_stamp(page: CachedPage) -> str:
+    """Empreinte du contenu d'une page (change si le HTML change)."""
+    return page.stamp or make_page(page.ts, page.body).stamp
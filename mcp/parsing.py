@@ -0,0 +1,145 @@
+# mcp/parsing.py
+import os
+import re
+from typing import Iterator, Optional
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+# Backends BeautifulSoup par ordre de préférence: lxml (C, plusieurs fois plus rapide)
+# puis html.parser (pur Python, toujours disponible). MCP_HTML_PARSER force un choix.
+PARSER_BACKENDS = ("lxml", "html.parser")
+
+_POSTCODE_RE = re.compile(r"\b69\d{3}\b")
+
+
+def _backend_available(name: str) -> bool:
+    if name == "html.parser":
+        return True
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def _pick_backend() -> str:
+    forced = os.getenv("MCP_HTML_PARSER")
+    if forced:
+        if not _backend_available(forced):
+            raise RuntimeError(f"MCP_HTML_PARSER={forced} indisponible (backends: {', '.join(PARSER_BACKENDS)})")
+        return forced
+    return next(b for b in PARSER_BACKENDS if _backend_available(b))
+
+
+HTML_PARSER = _pick_backend()
+
+
+def make_soup(html: str, parser: Optional[str] = None) -> BeautifulSoup:
+    return BeautifulSoup(html, parser or HTML_PARSER)
+
+
+class PageIndex:
+    """
+    Éléments d'une page indexés par nom de balise, construits en une seule passe
+    sur l'arbre. Les extracteurs l'interrogent au lieu d'enchaîner des find()/select()
+    qui reparcourent chacun tout le document (SoupStrainer / soupsieve en pur Python).
+    L'ordre du document est conservé partout.
+    """
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self.tags: list[Tag] = [el for el in soup.descendants if isinstance(el, Tag)]
+        self.by_name: dict[str, list[Tag]] = {}
+        for el in self.tags:
+            self.by_name.setdefault(el.name, []).append(el)
+
+    def find_all(self, *names: str) -> list[Tag]:
+        if len(names) == 1:
+            return self.by_name.get(names[0], [])
+        wanted = set(names)
+        return [el for el in self.tags if el.name in wanted]
+
+    def find(self, tag: str, **attrs: str) -> Optional[Tag]:
+        """Premier <tag> dont les attributs valent exactement `attrs` (comme soup.find)."""
+        for el in self.by_name.get(tag, []):
+            if all(k in el.attrs and _attr_text(el, k) == v for k, v in attrs.items()):
+                return el
+        return None
+
+    def find_by_attr(self, attr: str, value: str) -> Optional[Tag]:
+        for el in self.tags:
+            if attr in el.attrs and _attr_text(el, attr) == value:
+                return el
+        return None
+
+
+def _attr_text(el: Tag, name: str) -> str:
+    val = el.get(name)
+    if isinstance(val, list):  # attributs multi-valués (class)
+        return " ".join(val)
+    return val or ""
+
+
+def iter_links(index: PageIndex, prefix: str) -> Iterator[Tag]:
+    """<a> dont le href commence par `prefix` (équivaut à select('a[href^=...]'))."""
+    for a in index.find_all("a"):
+        if "href" in a.attrs and _attr_text(a, "href").startswith(prefix):
+            yield a
+
+
+def iter_links_containing(index: PageIndex, needles: tuple[str, ...]) -> Iterator[Tag]:
+    """<a> dont le href contient une des `needles` (équivaut à select('a[href*=...], ...'))."""
+    for a in index.find_all("a"):
+        if "href" in a.attrs:
+            href = _attr_text(a, "href")
+            if any(n in href for n in needles):
+                yield a
+
+
+def find_link(index: PageIndex, prefix: str) -> Optional[Tag]:
+    return next(iter_links(index, prefix), None)
+
+
+def find_attr_contains(index: PageIndex, attrs: tuple[str, ...], needles: tuple[str, ...]) -> Optional[Tag]:
+    """
+    Premier élément dont un des `attrs` contient une des `needles`
+    (équivaut à select_one("[class*='x'], [id*='y'], ...")).
+    """
+    for el in index.tags:
+        for name in attrs:
+            if name in el.attrs:
+                txt = _attr_text(el, name)
+                if any(n in txt for n in needles):
+                    return el
+    return None
+
+
+def find_address_block(index: PageIndex) -> Optional[Tag]:
+    """
+    Premier div/p/span (ordre du document) dont le texte contient un code postal 69xxx
+    et "lyon". Même résultat qu'un get_text() sur chaque div/p/span, mais en une passe
+    sur les chaînes de texte: seuls leurs ancêtres sont marqués, puis on prend le
+    premier élément marqué des deux côtés.
+    """
+    with_cp: set[int] = set()
+    with_lyon: set[int] = set()
+    for s in index.soup.strings:
+        cp = bool(_POSTCODE_RE.search(s))
+        lyon = "lyon" in s.lower()
+        if not (cp or lyon):
+            continue
+        for parent in s.parents:
+            if parent.name in ("div", "p", "span"):
+                if cp:
+                    with_cp.add(id(parent))
+                if lyon:
+                    with_lyon.add(id(parent))
+
+    both = with_cp & with_lyon
+    if not both:
+        return None
+    for el in index.find_all("div", "p", "span"):
+        if id(el) in both:
+            return el
+    return None
@@ -0,0 +1,4 @@
+import os
+
+# pas de cache SQLite sur disque pendant les tests (mcp.tools le crée à l'import)
+os.environ.setdefault("MCP_CACHE_DB", "")
@@ -0,0 +1,116 @@
+# Parité des extracteurs entre backends BeautifulSoup (lxml / html.parser),
+# sur des pages visiterlyon.com enregistrées dans fixtures/.
+from pathlib import Path
+
+import pytest
+
+from mcp import parsing, tools
+from mcp.parsing import PageIndex, find_address_block, make_soup
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BACKENDS = [b for b in parsing.PARSER_BACKENDS if parsing._backend_available(b)]
+PLACE_URL = "https://www.visiterlyon.com/lieux-a-visiter/test"
+AGENDA_URL = f"{tools.BASE}/sortir/l-agenda/tous-les-evenements"
+
+
+def _html(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    # _parse_agenda / _parse_search_results passent par make_soup(html) sans backend explicite
+    monkeypatch.setattr(parsing, "HTML_PARSER", request.param)
+    return request.param
+
+
+EXPECTED_PLACE_JSONLD = {
+    "url": PLACE_URL,
+    "name": "Musée des Confluences",
+    "phone": "04 28 38 12 12",
+    "website": "https://www.museedesconfluences.fr/",
+    "address": "86 quai Perrache 69002 Lyon",
+    "opening_hours": ["Tu-Fr 10:30-18:30", "Sa-Su 10:30-19:00"],
+    "prices": "12",
+    "short_description": (
+        "Le musée des Confluences, à la pointe de la Presqu'île, raconte l'histoire de l'humanité "
+        "à travers ses collections de sciences naturelles et de sociétés."
+    ),
+}
+
+# Pas d'adresse JSON-LD: premier div/p/span (ordre du document) contenant "69xxx" et "lyon"
+EXPECTED_ADDRESS_FALLBACK = (
+    "Accueil > Patrimoine Basilique Notre-Dame de Fourvière Adresse 8 place de Fourvière 69005 Lyon "
+    "04 78 25 86 19 fourviere.org Horaires Tous les jours de 7h à 19h. Tarifs & billetterie "
+    "Entrée libre pour la basilique. Visite guidée des toits : 10 € Visite guidée de la crypte : 7 € "
+    "Accès Funiculaire depuis Vieux Lyon, arrêt Fourvière."
+)
+
+EXPECTED_PLACE_FALLBACK = {
+    "url": PLACE_URL,
+    "name": "Basilique Notre-Dame de Fourvière",
+    "phone": "04 78 25 86 19",
+    "website": "https://www.fourviere.org",
+    "address": EXPECTED_ADDRESS_FALLBACK,
+    "opening_hours": "Horaires Tous les jours de 7h à 19h.",
+    "prices": "Entrée libre pour la basilique. Visite guidée des toits : 10 € Visite guidée de la crypte : 7 €",
+    "short_description": "Dominant la ville, la basilique de Fourvière offre un panorama exceptionnel sur Lyon.",
+}
+
+EXPECTED_AGENDA = [
+    {"title": "Tous", "url": AGENDA_URL, "info_pratique": None},
+    {
+        "title": "Fête des Lumières",
+        "url": f"{tools.BASE}/sortir/l-agenda/fete-des-lumieres-2026",
+        "info_pratique": "Fête des Lumières Du 5 au 8 décembre 2026 Presqu'île, Lyon 2e",
+    },
+    {
+        "title": "Les Nuits de Fourvière",
+        "url": f"{tools.BASE}/sortir/l-agenda/nuits-de-fourviere",
+        "info_pratique": "Les Nuits de Fourvière Théâtres romains de Fourvière – juin à juillet",
+    },
+    {"title": "Biennale de la danse", "url": f"{tools.BASE}/sortir/l-agenda/biennale-de-la-danse", "info_pratique": None},
+    {
+        "title": "Marché de Noël du Carré de Soie",
+        "url": f"{tools.BASE}/evenements/marche-de-noel-carre-de-soie",
+        "info_pratique": None,
+    },
+]
+
+EXPECTED_SEARCH = [
+    {"title": "Musée des Confluences", "url": f"{tools.BASE}/lieux-a-visiter/musees/musee-des-confluences", "type": "place"},
+    {"title": "Musée des Beaux-Arts de Lyon", "url": f"{tools.BASE}/lieux-a-visiter/musees/musee-des-beaux-arts", "type": "place"},
+    {"title": "Visite des traboules", "url": f"{tools.BASE}/sortir/visites-guidees/visite-des-traboules", "type": "activity"},
+    {"title": "Musée & Institut Lumière", "url": f"{tools.BASE}/lieux-a-visiter/musees/musee-lumiere", "type": "place"},
+    {"title": "Musées Gadagne", "url": f"{tools.BASE}/lieux-a-visiter/musees/gadagne", "type": "place"},
+]
+
+
+def test_extract_place_jsonld(backend):
+    soup = make_soup(_html("place_jsonld.html"), backend)
+    assert tools._extract_place(soup, PLACE_URL) == EXPECTED_PLACE_JSONLD
+
+
+def test_extract_place_address_fallback(backend):
+    soup = make_soup(_html("place_address_fallback.html"), backend)
+    assert tools._extract_place(soup, PLACE_URL) == EXPECTED_PLACE_FALLBACK
+
+
+def test_find_address_block(backend):
+    el = find_address_block(PageIndex(make_soup(_html("place_address_fallback.html"), backend)))
+    assert el is not None and el.name == "div" and el.get("id") == "page"
+    assert tools._first_text(el) == EXPECTED_ADDRESS_FALLBACK
+
+    # footer sans code postal: aucun bloc adresse
+    assert find_address_block(PageIndex(make_soup(_html("place_jsonld.html"), backend))) is None
+
+
+def test_parse_agenda(backend):
+    assert tools._parse_agenda(_html("agenda.html"), AGENDA_URL, 10) == (EXPECTED_AGENDA, True)
+    assert tools._parse_agenda(_html("agenda.html"), AGENDA_URL, 2) == (EXPECTED_AGENDA[:2], True)
+
+
+def test_parse_search_results(backend):
+    assert tools._parse_search_results(_html("search.html"), 10) == EXPECTED_SEARCH
+    assert tools._parse_search_results(_html("search.html"), 3) == EXPECTED_SEARCH[:3]
+
@@ -1,14 +1,29 @@
 # mcp/tools.py
+import asyncio
+import os
 import sys
 import time
 import json
 import re
-from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
 from urllib.parse import urljoin
 
-import requests
+import httpx
 from bs4 import BeautifulSoup
 
+from mcp.cache import AsyncSingleFlight, CachedPage, LRUCache, is_fresh, make_page, make_page_cache, page_stamp
+from mcp.parsing import (
+    PageIndex,
+    find_address_block,
+    find_attr_contains,
+    find_link,
+    iter_links,
+    iter_links_containing,
+    make_soup,
+)
+
 try:
     sys.stdout.reconfigure(encoding="utf-8")
 except Exception:
@@ -16,46 +31,146 @@ except Exception:
 
 BASE = "https://www.visiterlyon.com"
 
-_CACHE: dict[str, tuple[float, str]] = {} 
-CACHE_TTL_S = 300  # 5 minutes
+HEADERS = {
+    "User-Agent": "Epitech-IA-Agent-Project/1.0",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
 
+# Client HTTP asynchrone partagé (pool keep-alive), fermé au shutdown (voir mcp/app.py)
+HTTP_MAX_CONNECTIONS = 50
+_http: Optional[httpx.AsyncClient] = None
 
-def _cache_get(url: str) -> Optional[str]:
-    val = _CACHE.get(url)
-    if not val:
-        return None
-    ts, html = val
-    if time.time() - ts > CACHE_TTL_S:
-        _CACHE.pop(url, None)
+# Parsing HTML (CPU) hors de la boucle asyncio, dans un pool borné
+PARSE_WORKERS = min(8, (os.cpu_count() or 2) + 2)
+_PARSE_POOL = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="mcp-parse")
+
+# Cache de pages: LRU mémoire + tier SQLite partagé entre workers/redémarrages.
+# MCP_CACHE_DB="" désactive le tier disque.
+CACHE_TTL_S = 300  # 5 minutes, au-delà: revalidation conditionnelle (ETag / Last-Modified)
+CACHE_MAX_ENTRIES = 512
+CACHE_DB_PATH = os.getenv("MCP_CACHE_DB", str(Path(__file__).resolve().parent / ".cache" / "pages.sqlite3"))
+_PAGE_CACHE = make_page_cache(CACHE_DB_PATH or None, max_entries=CACHE_MAX_ENTRIES)
+
+# Résultats d'extraction (item scrape_place, détails d'événement) par (extracteur, version, url):
+# un hit évite le parse BeautifulSoup. Invalidés quand le HTML de la page change.
+EXTRACTOR_VERSION = 2  # à incrémenter dès qu'un extracteur change de sortie
+_PARSED_CACHE = LRUCache(max_entries=2048)
+
+# Recherches /app_search: cache par (requête normalisée, limit) + coalescence des
+# requêtes identiques en vol (un seul fetch amont)
+CATEGORY_CACHE_TTL_S = 600
+_CATEGORY_CACHE = LRUCache(max_entries=512)
+_CATEGORY_FLIGHTS = AsyncSingleFlight()
+
+T = TypeVar("T")
+
+# Pages détail des événements: récupérées en parallèle (concurrence bornée par appel)
+EVENT_DETAILS_CONCURRENCY = 8
+EVENT_DETAIL_TIMEOUT_S = 8   # par page
+EVENT_DETAILS_DEADLINE_S = 15  # pour l'ensemble des pages d'un appel
+
+# scrape_place_batch: plusieurs lieux en un appel, concurrence bornée et délai global
+PLACE_BATCH_MAX_URLS = 50
+PLACE_BATCH_CONCURRENCY = 8
+PLACE_BATCH_DEADLINE_S = 30
+
+
+def _client() -> httpx.AsyncClient:
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+        )
+    return _http
+
+
+async def aclose() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def _run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    return await asyncio.get_running_loop().run_in_executor(_PARSE_POOL, fn, *args)
+
+
+async def get_page_soup(url: str, timeout: float = 12) -> Optional[BeautifulSoup]:
+    html = await get_page_html(url, timeout=timeout)
+    if html is None:
         return None
-    return html
+    return await _run_cpu(make_soup, html)
 
 
-def _cache_set(url: str, html: str) -> None:
-    _CACHE[url] = (time.time(), html)
+async def get_page_html(url: str, timeout: float = 12) -> Optional[str]:
+    page = await _get_page(url, timeout=timeout)
+    return page.body if page is not None else None
 
 
-def get_page_soup(url: str) -> Optional[BeautifulSoup]:
-    headers = {
-        "User-Agent": "Epitech-IA-Agent-Project/1.0",
-        "Accept-Language": "fr-FR,fr;q=0.9",
-    }
+async def _get_page(url: str, timeout: float = 12) -> Optional[CachedPage]:
+    """
+    Page via le cache. Une entrée expirée est revalidée par GET
+    conditionnel (304 -> on garde le corps en cache); en cas d'erreur réseau
+    on sert l'entrée expirée plutôt que rien.
+    """
+    headers: dict[str, str] = {}
 
-    cached = _cache_get(url)
+    cached = await _PAGE_CACHE.aget(url)
     if cached is not None:
-        return BeautifulSoup(cached, "html.parser")
+        if is_fresh(cached, CACHE_TTL_S):
+            return cached
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
 
     try:
-        r = requests.get(url, headers=headers, timeout=12)
+        r = await _client().get(url, headers=headers, timeout=timeout)
+        if r.status_code == 304 and cached is not None:
+            page = cached._replace(ts=time.time())
+            await _PAGE_CACHE.aset(url, page)
+            return page
         r.raise_for_status()
-        html = r.text
-        _cache_set(url, html)
-        return BeautifulSoup(html, "html.parser")
-    except requests.Timeout:
-        return None
-    except requests.RequestException:
+        page = make_page(
+            ts=time.time(),
+            body=r.text,
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+        )
+        await _PAGE_CACHE.aset(url, page)
+        return page
+    except httpx.TimeoutException:
+        return cached
+    except httpx.HTTPError:
+        return cached
+
+
+async def _cached_extract(
+    name: str,
+    url: str,
+    extract: Callable[[BeautifulSoup], T],
+    timeout: float = 12,
+) -> Optional[T]:
+    """
+    extract(soup) pour la page `url`, mémoïsé par (extracteur, version, url) tant que
+    le contenu de la page est identique. None si la page est inaccessible.
+    """
+    page = await _get_page(url, timeout=timeout)
+    if page is None:
         return None
 
+    key = (name, EXTRACTOR_VERSION, url)
+    stamp = page_stamp(page)
+    hit = _PARSED_CACHE.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+
+    result = await _run_cpu(lambda: extract(make_soup(page.body)))
+    _PARSED_CACHE.set(key, (stamp, result))
+    return result
+
 
 def _clean_text(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
@@ -84,7 +199,7 @@ def _format_event_line(it: dict[str, Any]) -> str:
     return f"* {suffix} : {url}" if url else f"* {suffix}"
 
 
-def _extract_jsonld(soup: BeautifulSoup) -> list[dict[str, Any]]:
+def _extract_jsonld(soup: BeautifulSoup, index: Optional[PageIndex] = None) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
 
     def push(obj: Any) -> None:
@@ -98,7 +213,12 @@ def _extract_jsonld(soup: BeautifulSoup) -> list[dict[str, Any]]:
             for x in obj:
                 push(x)
 
-    for script in soup.find_all("script", type="application/ld+json"):
+    scripts = (
+        [el for el in index.find_all("script") if el.get("type") == "application/ld+json"]
+        if index is not None
+        else soup.find_all("script", type="application/ld+json")
+    )
+    for script in scripts:
         try:
             data = json.loads(script.get_text(strip=True))
             push(data)
@@ -116,15 +236,16 @@ def _extract_jsonld(soup: BeautifulSoup) -> list[dict[str, Any]]:
     return uniq
 
 
-def _event_details(url: str) -> dict[str, Any]:
+async def _event_details(url: str, timeout: float = 12) -> dict[str, Any]:
     """
     Ouvre une page d'événement et tente d'extraire des infos structurées via JSON-LD (@type=Event).
     Retourne un dict avec startDate/endDate/location si trouvés.
     """
-    soup = get_page_soup(url)
-    if not soup:
-        return {}
+    details = await _cached_extract("event_details", url, _extract_event_details, timeout=timeout)
+    return dict(details) if details else {}
+
 
+def _extract_event_details(soup: BeautifulSoup) -> dict[str, Any]:
     for obj in _extract_jsonld(soup):
         typ = obj.get("@type")
 
@@ -180,12 +301,45 @@ def _event_details(url: str) -> dict[str, Any]:
 
 
 
-def _extract_section_text(soup: BeautifulSoup, keywords: list[str]) -> Optional[str]:
+async def _event_details_many(urls: list[str]) -> dict[str, dict[str, Any]]:
+    """
+    Récupère les détails de plusieurs événements en parallèle.
+    Délai par page (EVENT_DETAIL_TIMEOUT_S) et global (EVENT_DETAILS_DEADLINE_S):
+    les pages non terminées à l'échéance sont simplement absentes du résultat.
+    """
+    sem = asyncio.Semaphore(EVENT_DETAILS_CONCURRENCY)
+
+    async def one(url: str) -> dict[str, Any]:
+        async with sem:
+            return await _event_details(url, EVENT_DETAIL_TIMEOUT_S)
+
+    tasks = {asyncio.create_task(one(url)): url for url in dict.fromkeys(urls)}
+    if not tasks:
+        return {}
+    done, not_done = await asyncio.wait(tasks, timeout=EVENT_DETAILS_DEADLINE_S)
+    for t in not_done:
+        t.cancel()
+
+    out: dict[str, dict[str, Any]] = {}
+    for t in done:
+        try:
+            out[tasks[t]] = t.result()
+        except Exception:
+            continue
+    return out
+
+
+def _extract_section_text(
+    soup: BeautifulSoup,
+    keywords: list[str],
+    index: Optional[PageIndex] = None,
+) -> Optional[str]:
     """
     Cherche une section par titre (h2/h3) contenant un mot-clé
     et récupère le texte qui suit.
     """
-    for heading in soup.find_all(["h2", "h3"]):
+    headings = index.find_all("h2", "h3") if index is not None else soup.find_all(["h2", "h3"])
+    for heading in headings:
         htxt = (_first_text(heading) or "").lower()
         if any(k in htxt for k in keywords):
             texts = []
@@ -221,31 +375,52 @@ def _err_item(source_url: str, msg: str) -> dict[str, Any]:
     return {"ok": False, "source_url": source_url, "item": None, "error": msg}
 
 
-def scrape_category(query: str, limit: int = 10) -> dict[str, Any]:
+def _norm_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+async def scrape_category(query: str, limit: int = 10) -> dict[str, Any]:
     """
     Recherche simple sur visiterlyon.com.
     Retour: {ok, source_url, items:[{title,url,type}], error}
     """
+    key = (_norm_query(query), limit)
+    hit = _CATEGORY_CACHE.get(key)
+    if hit is not None and time.time() - hit[0] <= CATEGORY_CACHE_TTL_S:
+        res = hit[1]
+    else:
+        res = await _CATEGORY_FLIGHTS.do(key, lambda: _scrape_category_cached(key))
+    return {**res, "items": [dict(it) for it in res["items"]]}
+
+
+async def _scrape_category_cached(key: tuple[str, int]) -> dict[str, Any]:
+    res = await _scrape_category(*key)
+    if res["ok"]:
+        _CATEGORY_CACHE.set(key, (time.time(), res))
+    return res
+
+
+async def _scrape_category(query: str, limit: int) -> dict[str, Any]:
     source_url = f"{BASE}/app_search?simple_search%5BsearchText%5D={query}"
     search_url = f"{BASE}/app_search"
     params = {"simple_search[searchText]": query}
 
-    headers = {
-        "User-Agent": "Epitech-IA-Agent-Project/1.0",
-        "Accept-Language": "fr-FR,fr;q=0.9",
-    }
-
     try:
-        r = requests.get(search_url, headers=headers, params=params, timeout=12)
+        r = await _client().get(search_url, params=params, timeout=12)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        items = await _run_cpu(_parse_search_results, r.text, limit)
     except Exception:
         return _err_items(source_url, "Impossible de contacter le site pour la recherche.")
 
+    return _ok_items(source_url, items)
+
+
+def _parse_search_results(html: str, limit: int) -> list[dict[str, Any]]:
+    soup = make_soup(html)
     items: list[dict[str, Any]] = []
     seen: set[str] = set()
 
-    for a in soup.select('a[href^="/"]'):
+    for a in iter_links(PageIndex(soup), "/"):
         href = a.get("href", "")
         if not href:
             continue
@@ -271,10 +446,10 @@ def scrape_category(query: str, limit: int = 10) -> dict[str, Any]:
         if len(items) >= limit:
             break
 
-    return _ok_items(source_url, items)
+    return items
 
 
-def scrape_place(url: str) -> dict[str, Any]:
+async def scrape_place(url: str) -> dict[str, Any]:
     """
     Extrait les détails pratiques d'un lieu.
     Retour: {ok, source_url, item:{...}, error}
@@ -282,20 +457,60 @@ def scrape_place(url: str) -> dict[str, Any]:
     if not url.startswith(BASE):
         return _err_item(url, "URL invalide. L'URL doit provenir de visiterlyon.com")
 
-    soup = get_page_soup(url)
-    if not soup:
+    item = await _cached_extract("place", url, lambda soup: _extract_place(soup, url))
+    if item is None:
         return _err_item(url, "Impossible de récupérer la page (timeout ou erreur réseau).")
 
-    jsonld = _extract_jsonld(soup)
+    return _ok_item(url, dict(item))
+
+
+async def scrape_place_batch(urls: list[str]) -> dict[str, Any]:
+    """
+    scrape_place sur plusieurs URLs en parallèle (PLACE_BATCH_CONCURRENCY pages à la fois).
+    Retour: {ok, results:[{ok, source_url, item, error}], error}, un résultat par URL
+    (dédupliquées, dans l'ordre). Les pages non terminées au bout de
+    PLACE_BATCH_DEADLINE_S sont en erreur, les autres restent exploitables.
+    """
+    urls = list(dict.fromkeys(urls))
+    if len(urls) > PLACE_BATCH_MAX_URLS:
+        return {"ok": False, "results": [], "error": f"Trop d'URLs (max {PLACE_BATCH_MAX_URLS})."}
+
+    sem = asyncio.Semaphore(PLACE_BATCH_CONCURRENCY)
+
+    async def one(url: str) -> dict[str, Any]:
+        async with sem:
+            return await scrape_place(url)
+
+    tasks = [asyncio.create_task(one(url)) for url in urls]
+    not_done: set[asyncio.Task[dict[str, Any]]] = set()
+    if tasks:
+        _, not_done = await asyncio.wait(tasks, timeout=PLACE_BATCH_DEADLINE_S)
+        for t in not_done:
+            t.cancel()
+
+    results: list[dict[str, Any]] = []
+    for url, t in zip(urls, tasks):
+        if t in not_done:
+            results.append(_err_item(url, "Délai dépassé pour cette page."))
+        elif t.exception() is not None:
+            results.append(_err_item(url, "Impossible de récupérer la page (timeout ou erreur réseau)."))
+        else:
+            results.append(t.result())
+    return {"ok": True, "results": results, "error": None}
+
+
+def _extract_place(soup: BeautifulSoup, url: str) -> dict[str, Any]:
+    index = PageIndex(soup)
+    jsonld = _extract_jsonld(soup, index)
 
     item: dict[str, Any] = {"url": url}
-    item["name"] = _first_text(soup.find("h1"))
+    item["name"] = _first_text(index.find("h1"))
 
-    phone = soup.select_one('a[href^="tel:"]')
+    phone = find_link(index, "tel:")
     item["phone"] = _first_text(phone)
 
     website = None
-    for a in soup.select('a[href^="http"]'):
+    for a in iter_links(index, "http"):
         href = a.get("href", "")
         if href and "visiterlyon.com" not in href:
             website = href
@@ -303,16 +518,10 @@ def scrape_place(url: str) -> dict[str, Any]:
     item["website"] = website
 
     # Adresse
-    address = _first_text(soup.find("address") or soup.select_one("[itemprop='address']"))
+    address = _first_text(index.find("address") or index.find_by_attr("itemprop", "address"))
 
     if not address:
-        for cand in soup.select("div, p, span"):
-            txt = _first_text(cand)
-            if not txt:
-                continue
-            if re.search(r"\b69\d{3}\b", txt) and ("lyon" in txt.lower()):
-                address = txt
-                break
+        address = _first_text(find_address_block(index))
 
     if not address:
         for obj in jsonld:
@@ -334,7 +543,7 @@ def scrape_place(url: str) -> dict[str, Any]:
             opening = oh
             break
     if not opening:
-        cand = soup.select_one("[class*='horaire'], [class*='opening'], [id*='horaire'], [id*='opening']")
+        cand = find_attr_contains(index, ("class", "id"), ("horaire", "opening"))
         if cand:
             opening = _first_text(cand)
 
@@ -350,32 +559,51 @@ def scrape_place(url: str) -> dict[str, Any]:
                 prices = str(p)
                 break
     if not prices:
-        prices = _extract_section_text(soup, ["tarif", "tarifs", "prix", "billet", "tickets"])
+        prices = _extract_section_text(soup, ["tarif", "tarifs", "prix", "billet", "tickets"], index)
     item["prices"] = prices
 
     # Description
-    meta_desc = soup.find("meta", attrs={"name": "description"})
+    meta_desc = index.find("meta", name="description")
     if meta_desc and meta_desc.get("content"):
         item["short_description"] = _clean_text(meta_desc["content"])
 
-    return _ok_item(url, item)
+    return item
 
-def scrape_events(limit: int = 10) -> dict[str, Any]:
+async def scrape_events(limit: int = 10) -> dict[str, Any]:
     """
     Récupère des événements de l'agenda.
     Retour: {ok, source_url, items:[{title,url,info_pratique}], error}
     """
     source_url = f"{BASE}/sortir/l-agenda/tous-les-evenements"
-    soup = get_page_soup(source_url)
-    if not soup:
+    html = await get_page_html(source_url)
+    if html is None:
         return _err_items(source_url, "Agenda inaccessible (timeout ou erreur réseau).")
 
+    items, from_agenda = await _run_cpu(_parse_agenda, html, source_url, limit)
+
+    # Détails (dates, lieu) de toutes les pages en parallèle, résultats partiels si timeout
+    if from_agenda:
+        details_by_url = await _event_details_many([it["url"] for it in items])
+        for it in items:
+            details = details_by_url.get(it["url"], {})
+            it["startDate"] = details.get("startDate")
+            it["endDate"] = details.get("endDate")
+            it["location"] = details.get("location")
+
+    return _ok_items(source_url, items)
+
+
+def _parse_agenda(html: str, source_url: str, limit: int) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Liens d'événements de la page agenda. Retourne (items, from_agenda):
+    from_agenda=False si on a dû se rabattre sur les liens génériques (pas de détails à chercher).
+    """
+    soup = make_soup(html)
     items: list[dict[str, Any]] = []
     seen: set[str] = set()
 
-    candidates = soup.select(
-        'a[href*="/sortir/l-agenda/"], a[href*="/evenement"], a[href*="/evenements"]'
-    )
+    index = PageIndex(soup)
+    candidates = iter_links_containing(index, ("/sortir/l-agenda/", "/evenement", "/evenements"))
 
     for a in candidates:
         href = a.get("href", "")
@@ -399,34 +627,31 @@ def scrape_events(limit: int = 10) -> dict[str, Any]:
                 info = txt
 
         seen.add(url)
-        details = _event_details(url)
-
         items.append({
             "title": title,
             "url": url,
             "info_pratique": info,
-            "startDate": details.get("startDate"),
-            "endDate": details.get("endDate"),
-            "location": details.get("location"),
         })
 
         if len(items) >= limit:
             break
 
-    if not items:
-        for a in soup.select('a[href^="/"]'):
-            href = a.get("href", "")
-            if "/agenda" not in href and "even" not in href:
-                continue
-            url = urljoin(BASE, href)
-            if url in seen:
-                continue
-            title = _first_text(a) or ""
-            if len(title) < 6:
-                continue
-            seen.add(url)
-            items.append({"title": title[:220], "url": url, "info_pratique": None})
-            if len(items) >= limit:
-                break
+    if items:
+        return items, True
 
-    return _ok_items(source_url, items)
+    for a in iter_links(index, "/"):
+        href = a.get("href", "")
+        if "/agenda" not in href and "even" not in href:
+            continue
+        url = urljoin(BASE, href)
+        if url in seen:
+            continue
+        title = _first_text(a) or ""
+        if len(title) < 6:
+            continue
+        seen.add(url)
+        items.append({"title": title[:220], "url": url, "info_pratique": None})
+        if len(items) >= limit:
+            break
+
+    return items, False